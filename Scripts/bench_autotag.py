@@ -0,0 +1,61 @@
+"""
+Benchmark for brain.core.nlp_utils.AutoTagger over a synthetic chat corpus.
+
+Usage: python Scripts/bench_autotag.py [num_messages]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from brain.core.nlp_utils import AutoTagger, TAG_LEXICON
+
+FILLER = (
+    "the portal hums again tonight and i keep thinking about what you said earlier "
+    "maybe we should rewrite everything from scratch before the weekend ends honestly"
+).split()
+
+
+def synthetic_corpus(size, seed=7):
+    rng = random.Random(seed)
+    lexicon_words = [word for words in TAG_LEXICON.values() for word in words]
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(6, 30))]
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(lexicon_words))
+        prefix = rng.choice(["User: ", "Judy: ", ""])
+        corpus.append(prefix + " ".join(words))
+    # Chat logs repeat themselves; make ~20% of messages exact duplicates.
+    corpus += [rng.choice(corpus) for _ in range(size // 5)]
+    rng.shuffle(corpus)
+    return corpus
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {elapsed / count * 1e6:8.1f} us/msg")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    corpus = synthetic_corpus(size)
+    print(f"[bench_autotag] {len(corpus)} messages")
+
+    tagger = AutoTagger(cache_size=len(corpus))
+    timed("cold, one at a time", lambda: [tagger.tag(text) for text in corpus], len(corpus))
+    timed("warm (cache hits)", lambda: [tagger.tag(text) for text in corpus], len(corpus))
+
+    tagger = AutoTagger(cache_size=len(corpus))
+    timed("cold, batches of 64", lambda: [tagger.tag_batch(corpus[i:i + 64]) for i in range(0, len(corpus), 64)],
+          len(corpus))
+    print(f"[bench_autotag] cache stats: {tagger.stats()}")
+    print(f"[bench_autotag] sample: {corpus[0]!r} -> {tagger.tag(corpus[0])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,41 @@
 import threading
 import time
 import datetime
-import json
 import os
 import concurrent.futures
-from brain.core.text_generation import TextGeneration
-from brain.core.prompt_frame import prompt_template
+from brain.core.text_generation import GenerationStream
+from brain.core.model_service import PRIORITY_INTERACTIVE, PRIORITY_PREFETCH, get_model_service
+from brain.core.single_flight import SingleFlightRefresher
+from brain.core.prompt_assembler import PromptAssembler
+from brain.core.config_cache import get_config_cache
+from brain.core.prompt_frame import system_prefix_formatter, turn_formatter
+
+# Stands in for the message when only the prompt up to it is wanted (a private-use character, never in a template).
+_MESSAGE_MARK = "\ue000"
 
 class JalenAgent:
-    def __init__(self, memory_daemon, state_manager, model_path=None):
+    def __init__(self, memory_daemon, state_manager, model_path=None, memory_candidates=50,
+                 prime_while_typing=True, context_max_age=2.0, temperature=0.7, cache_responses=False):
         self.state_manager = state_manager
         self.memory_daemon = memory_daemon
         self._running = False
         self._input_thread = None
-        self.text_gen = TextGeneration(model_path=model_path)
+        # Shared with every other agent using the same model path; the model loads once.
+        self.model_service = get_model_service(model_path)
+        self.text_gen = self.model_service.text_gen
+        # Memories packed into each prompt are picked from the newest `memory_candidates`
+        self.memory_candidates = memory_candidates
+        self.core_profile_path = os.path.join(os.path.dirname(__file__), '../core/core_profile.json')
+        # Opt-in: with cache_responses and temperature 0, identical prompts are answered from cache
+        self.temperature = temperature
+        self.cache_responses = cache_responses
+        self.prompt_assembler = PromptAssembler(self.text_gen.count_tokens, context_size=self.text_gen.n_ctx,
+                                                exact=self.text_gen.is_loaded)
+        # Context pre-assembled while the user types (see on_typing); reused on send if fresh
+        self.prime_while_typing = prime_while_typing
+        self.context_max_age = context_max_age
+        self._prime_request = None
+        self.context_refresher = SingleFlightRefresher(self.prepare_context, debounce=0.3, initial=None)
 
     def start_chatbox(self):
         if self._running:
@@ -37,17 +59,21 @@ class JalenAgent:
                 self.memory_daemon.add_memory({"timestamp": datetime.datetime.now().isoformat(), "text": f"User: {message}"}, memory_type="short")
                 self.state_manager.add_memory_chroma(f"User: {message}", memory_type="short", metadata={"timestamp": time.time(), "role": "user"})
 
-                # Run Judy's response in a background thread and print when ready
-                def print_response(response):
+                # Stream Judy's response to the terminal as it is generated
+                def print_token(piece):
+                    print(piece, end="", flush=True)
+
+                def store_response(response, cancelled):
+                    response = response.strip()
+                    print()
                     # Store Judy's response in both legacy and ChromaDB memory
                     self.memory_daemon.add_memory({"timestamp": datetime.datetime.now().isoformat(), "text": f"Judy: {response}"}, memory_type="short")
                     self.state_manager.add_memory_chroma(f"Judy: {response}", memory_type="short", metadata={"timestamp": time.time(), "role": "judy"})
-                    print(f"Judy🌹: {response}")
 
-                self.generate_response_async(message, print_response)
-                # Wait for the response to print before accepting new input
-                while hasattr(self, '_executor') and any(f.running() for f in getattr(self._executor, '_threads', [])):
-                    time.sleep(0.1)
+                print("Judy🌹: ", end="", flush=True)
+                handle = self.generate_response_stream(message, print_token, store_response)
+                # Wait for the response to finish before accepting new input
+                handle.join()
 
             except Exception as e:
                 print(f"[Judy🌹] Error in chat loop: {e}")
@@ -66,9 +92,10 @@ class JalenAgent:
             parts = message.split(maxsplit=1)
             if len(parts) == 2:
                 new_model_path = parts[1].strip()
+                # Loads in the background; the current model keeps answering until it's ready.
                 self.text_gen.switch_model(new_model_path)
-                print(f"[JalenAgent] Switched model to: {new_model_path}")
-                return f"[Judy🌹] Model switched to: {os.path.basename(new_model_path)}"
+                print(f"[JalenAgent] Switching model to: {new_model_path}")
+                return f"[Judy🌹] Loading {os.path.basename(new_model_path)}... I'll switch over once it's warm."
             else:
                 return "[Judy🌹] Usage: /switchmodel <model_path>"
         return None
@@ -83,37 +110,161 @@ class JalenAgent:
             if cmd_result:
                 return cmd_result
 
-        # Load Judy's core profile
-        core_profile_path = os.path.join(os.path.dirname(__file__), '../core/core_profile.json')
-        try:
-            with open(core_profile_path, 'r', encoding='utf-8') as f:
-                core_profile = json.load(f)
-        except Exception:
-            core_profile = {}
+        assembled = self.assemble_prompt(user_input, self.take_prepared_context())
+        self._cancel_prime()
+        response = self.model_service.generate(assembled.prompt, priority=PRIORITY_INTERACTIVE,
+                                               prefix=assembled.prefix, max_tokens=assembled.max_tokens,
+                                               temperature=self.temperature, cache=self.cache_responses)
+        return response.strip()
+
+    def generate_response_stream(self, user_input, on_token, on_done=None, context=None):
+        """
+        Like generate_response, but tokens are passed to on_token(piece) as they are decoded
+        and on_done(full_text, cancelled) is called at the end. Returns a GenerationStream
+        handle at once: the prompt is assembled on the handle's thread, not the caller's,
+        so UI threads never wait on it. Call .cancel() on the handle to stop decoding.
+        `context` is a gather_context() result to build on; by default the one prepared
+        while typing is used if fresh.
+        """
+        handle = GenerationStream()
+        if user_input.startswith("/"):
+            cmd_result = self.handle_command(user_input)
+            if cmd_result:
+                handle.text = cmd_result
+                on_token(cmd_result)
+                if on_done:
+                    on_done(cmd_result, False)
+                return handle
+
+        def on_piece(piece):
+            handle.text += piece
+            on_token(piece)
+
+        def worker():
+            try:
+                assembled = self.assemble_prompt(user_input, context or self.take_prepared_context())
+            except Exception as e:
+                print(f"[JalenAgent] Could not assemble prompt: {e}")
+                handle.error = e
+                if on_done:
+                    on_done("", False)
+                return
+            self._cancel_prime()
+            request = self.model_service.submit(assembled.prompt, priority=PRIORITY_INTERACTIVE,
+                                                prefix=assembled.prefix, max_tokens=assembled.max_tokens,
+                                                temperature=self.temperature, cache=self.cache_responses,
+                                                on_token=on_piece, on_done=on_done,
+                                                cancel_event=handle.cancel_event)
+            request.join()
+            handle.cancelled = request.cancelled
+            handle.error = request.error
+
+        handle.thread = threading.Thread(target=worker, daemon=True)
+        handle.thread.start()
+        return handle
+
+    def build_prompt(self, user_input):
+        """
+        Assemble the full Judy prompt for user_input.
+        """
+        return self.assemble_prompt(user_input).prompt
+
+    def assemble_prompt(self, user_input, context=None, query=None):
+        """
+        Build the prompt for user_input within the model's context budget. Returns an
+        AssembledPrompt: the prompt, its static prefix (whose KV state the model layer
+        caches), the reply's max_tokens and the memories that fit. Memories are ranked
+        against `query`, which defaults to user_input.
+        """
+        context = context or self.gather_context()
+        return self.prompt_assembler.assemble(
+            turn_formatter,
+            {"mood": context["mood"], "scene": context["scene"], "user_message": user_input},
+            memories=context["memories"],
+            query=user_input if query is None else query,
+            prefix=context["prefix"],
+            pinned=context["pinned"],
+        )
+
+    def gather_context(self):
+        """
+        Everything the prompt needs besides the message itself: the rendered profile
+        prefix, mood, scene, candidate memories and the rolling summary.
+        """
+        # Judy's core profile, re-read only when the file changes
+        core_profile = get_config_cache().load_json(self.core_profile_path, default={}) or {}
         # Gather context
         mood = self.state_manager.get_mood() if hasattr(self.state_manager, 'get_mood') else "neutral"
         scene = self.state_manager.state.get("scene", "default")
-        # Optionally, fetch recent memories (stubbed here)
-        recent_memories = ""
+        memories = []
         if hasattr(self.state_manager, 'get_memories'):
-            memories = self.state_manager.get_memories(memory_type="short")
-            recent_memories = '\n'.join([m['text'] for m in memories[-5:]])
-        # Compose prompt
-        prompt = prompt_template.format(
+            memories = [m.get('text', '') for m in self.state_manager.get_memories(memory_type="short")]
+        # Rolling summary of older conversation, if a summarizer is attached
+        summarizer = getattr(self.memory_daemon, 'summarizer', None)
+        earlier = f"[Earlier] {summarizer.summary}" if summarizer and summarizer.summary else ""
+        prefix = system_prefix_formatter.format(
             judy_name=core_profile.get("name", "Judy"),
             user_name=core_profile.get("preferred_pet_names", ["Stixx"])[0],
-            mood=mood,
-            scene=scene,
-            recent_memories=recent_memories,
-            user_message=user_input
         )
-        response = self.text_gen.generate(prompt)
-        return response.strip()
+        return {
+            "prefix": prefix,
+            "mood": mood,
+            "scene": scene,
+            "memories": memories[-self.memory_candidates:],
+            "pinned": [earlier],
+        }
+
+    def on_typing(self, draft):
+        """
+        Called as the user types (e.g. on every key release). Debounced: context is
+        re-gathered and pre-assembled at most once per pause in typing.
+        """
+        self.context_refresher.request(draft=draft)
+
+    def prepare_context(self, draft=""):
+        """
+        Gather context and assemble a draft prompt off the UI thread, so token counts
+        are cached before the message is sent. With `prime_while_typing`, the prompt up
+        to the message is also run through the model (one token, prefetch priority) so
+        its KV state is warm and only the message itself is evaluated on send.
+        Returns (prepared_at, context).
+        """
+        context = self.gather_context()
+        # The message slot holds a marker, so the prompt can be cut exactly where the message goes.
+        assembled = self.assemble_prompt(_MESSAGE_MARK, context, query=draft)
+        if self.prime_while_typing and draft.strip():
+            head = assembled.prompt[:assembled.prompt.index(_MESSAGE_MARK)]
+            self._cancel_prime()
+            self._prime_request = self.model_service.submit(head, priority=PRIORITY_PREFETCH, timeout=10.0,
+                                                            max_tokens=1, temperature=0.0,
+                                                            prefix=assembled.prefix)
+        return (time.monotonic(), context)
+
+    def take_prepared_context(self):
+        """The context prepared while typing, or None if there is none or it's too old."""
+        prepared = self.context_refresher.value
+        if prepared and time.monotonic() - prepared[0] <= self.context_max_age:
+            return prepared[1]
+        return None
+
+    def _cancel_prime(self):
+        # A prime still queued is superseded; one already running is evaluating what we need anyway.
+        request, self._prime_request = self._prime_request, None
+        if request is not None and request.status == "queued":
+            request.cancel()
 
-    def greet(self):
+    def greet(self, use_model=False):
         """
         Generate Judy's initial greeting for first message in chat or GUI.
+        With use_model, the greeting comes from the model with greedy sampling, cached,
+        so reopening the chat in the same mood and scene doesn't decode it again.
         """
+        if use_model:
+            assembled = self.assemble_prompt("(Stixx just opened the chat. Say hello.)")
+            greeting = self.model_service.generate(assembled.prompt, priority=PRIORITY_INTERACTIVE,
+                                                   prefix=assembled.prefix, max_tokens=min(assembled.max_tokens, 128),
+                                                   temperature=0.0, cache=True)
+            return greeting.strip()
         greeting = "Hello! I'm Judy, your AI assistant. How can I help you today?"
         return greeting
 
@@ -0,0 +1,63 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. Add every pattern, call build(), then each
+    iter_matches() scans the text once, in time linear in the text plus matches,
+    no matter how many patterns there are.
+    """
+
+    def __init__(self):
+        self._goto = [{}]       # state -> {char: state}
+        self._fail = [0]
+        self._out = [[]]        # state -> [(pattern_length, value)]
+        self._built = False
+
+    def add(self, pattern, value):
+        if not pattern:
+            return
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        for state in queue:
+            self._fail[state] = 0
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0) if self._goto[f].get(ch, 0) != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text):
+        """Yield (start, end, value) for every occurrence of every pattern."""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, value in out[state]:
+                yield i - length + 1, i + 1, value
+
+    def __len__(self):
+        return len(self._goto)
@@ -0,0 +1,246 @@
+import threading
+import time
+
+
+class ChromaIngestQueue:
+    """
+    Buffers documents per ChromaDB collection and writes them in batches.
+
+    A batch is written as soon as a collection has `batch_size` documents waiting, or
+    `flush_interval` seconds after its oldest document was queued. `put()` blocks while
+    `max_pending` documents are already waiting (back-pressure), so a large migration
+    can't outrun the embedder and balloon memory. `flush()` drains everything
+    synchronously; `stop()` flushes and ends the worker.
+
+    The queue also keeps a dedup index of every document ID already stored or pending
+    in each collection, so re-queuing a known ID is a no-op unless `replace=True`.
+    Observers are told about every completed write and delete. If `embed_fn` is given,
+    each batch is embedded with it and the vectors passed to ChromaDB directly.
+
+    A batch whose write fails goes back to the front of its buffer and is retried on the
+    next flush, up to `max_attempts` writes; after that its documents are moved to
+    `failed` (a dead-letter list) and observers get a "failed" event. Every failed
+    attempt is reported the same way, with "dead" telling the two apart.
+    """
+
+    def __init__(self, collections, batch_size=64, flush_interval=1.0, max_pending=1024, embed_fn=None,
+                 max_attempts=3):
+        self.collections = collections  # {name: chromadb collection}
+        self.embed_fn = embed_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.failed = []  # (collection, doc_id, text, metadata) given up on after max_attempts
+        self._attempts = {}  # (collection, doc_id) -> failed writes so far
+        self.batches_written = 0
+        self.docs_written = 0
+        self._buffers = {name: [] for name in collections}
+        self._known = {name: self._load_ids(collection) for name, collection in collections.items()}
+        self._oldest = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._observers = []
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def register_observer(self, callback):
+        """
+        callback(event_type, data) with event_type "written", "deleted" or "failed" and
+        data {"collection", "ids"[, "documents", "metadatas"]}; "failed" also carries
+        "error" and "dead" (True once the documents were given up on).
+        """
+        self._observers.append(callback)
+
+    def notify_observers(self, event_type, data):
+        for cb in self._observers:
+            try:
+                cb(event_type, data)
+            except Exception as e:
+                print(f"[ChromaIngestQueue] Observer error: {e}")
+
+    @staticmethod
+    def _load_ids(collection):
+        try:
+            return set(collection.get(include=[])["ids"])
+        except Exception as e:
+            print(f"[ChromaIngestQueue] Could not load existing IDs: {e}")
+            return set()
+
+    def contains(self, collection_name, doc_id):
+        with self._cond:
+            return doc_id in self._known[collection_name]
+
+    def put(self, collection_name, doc_id, text, metadata, replace=False):
+        """
+        Queue a document. Returns False without queuing if the ID is already stored or
+        pending and `replace` is not set.
+        """
+        with self._cond:
+            known = self._known[collection_name]
+            if doc_id in known and not replace:
+                return False
+            buffer = self._buffers[collection_name]
+            if doc_id in known:
+                # Still buffered: replace that entry, since one upsert can't carry the same ID twice.
+                for i, item in enumerate(buffer):
+                    if item[0] == doc_id:
+                        buffer[i] = (doc_id, text, metadata)
+                        return True
+            known.add(doc_id)
+            while self._running and self._pending >= self.max_pending:
+                self._cond.wait()
+            if not buffer:
+                self._oldest[collection_name] = time.monotonic()
+            buffer.append((doc_id, text, metadata))
+            self._pending += 1
+            if len(buffer) >= self.batch_size or len(buffer) == 1:
+                self._cond.notify_all()
+            return True
+
+    def delete(self, collection_name, ids):
+        """Drop documents from the collection, including any still waiting in the buffer."""
+        ids = set(ids)
+        with self._cond:
+            buffer = self._buffers[collection_name]
+            kept = [item for item in buffer if item[0] not in ids]
+            self._pending -= len(buffer) - len(kept)
+            buffer[:] = kept
+            if not kept:
+                self._oldest.pop(collection_name, None)
+            self._known[collection_name].difference_update(ids)
+            self._cond.notify_all()
+        with self._write_lock:
+            try:
+                self.collections[collection_name].delete(ids=list(ids))
+            except Exception as e:
+                print(f"[ChromaIngestQueue] Failed to delete {len(ids)} docs from '{collection_name}': {e}")
+                return
+        self.notify_observers("deleted", {"collection": collection_name, "ids": list(ids)})
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def flush(self):
+        """
+        Write every buffered document now, on the calling thread. Failing batches are
+        retried until written or dead-lettered. Returns False if anything was dead-lettered.
+        """
+        dead_before = len(self.failed)
+        while True:
+            with self._cond:
+                batches = [(name, self._take(name)) for name in self._buffers if self._buffers[name]]
+            if not batches:
+                return len(self.failed) == dead_before
+            for name, batch in batches:
+                self._write(name, batch)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+    def _take(self, name):
+        # Caller holds self._cond.
+        batch = self._buffers[name][:self.batch_size]
+        del self._buffers[name][:self.batch_size]
+        if self._buffers[name]:
+            self._oldest[name] = time.monotonic()
+        else:
+            self._oldest.pop(name, None)
+        self._pending -= len(batch)
+        self._cond.notify_all()
+        return batch
+
+    def _next_ready(self):
+        # Caller holds self._cond. Returns (name, seconds_until_due).
+        now = time.monotonic()
+        best_name, best_wait = None, None
+        for name, buffer in self._buffers.items():
+            if not buffer:
+                continue
+            wait = 0 if len(buffer) >= self.batch_size else self._oldest[name] + self.flush_interval - now
+            if best_wait is None or wait < best_wait:
+                best_name, best_wait = name, wait
+        return best_name, best_wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                name, wait = self._next_ready()
+                if not self._running:
+                    return
+                if name is None:
+                    self._cond.wait()
+                    continue
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                batch = self._take(name)
+            self._write(name, batch)
+
+    def _write(self, name, batch):
+        if not batch:
+            return
+        ids = [doc_id for doc_id, _, _ in batch]
+        documents = [text for _, text, _ in batch]
+        metadatas = [meta for _, _, meta in batch]
+        with self._write_lock:
+            try:
+                # upsert so re-ingesting an edited memory under the same ID replaces it.
+                if self.embed_fn:
+                    self.collections[name].upsert(documents=documents, metadatas=metadatas, ids=ids,
+                                                  embeddings=self.embed_fn(documents))
+                else:
+                    self.collections[name].upsert(documents=documents, metadatas=metadatas, ids=ids)
+                self.batches_written += 1
+                self.docs_written += len(batch)
+            except Exception as e:
+                print(f"[ChromaIngestQueue] Failed to write {len(batch)} docs to '{name}': {e}")
+                self._retry_or_drop(name, batch, e)
+                return
+        with self._cond:
+            for doc_id in ids:
+                self._attempts.pop((name, doc_id), None)
+        self.notify_observers("written", {
+            "collection": name, "ids": ids, "documents": documents, "metadatas": metadatas,
+        })
+
+    def _retry_or_drop(self, name, batch, error):
+        """Put a failed batch back at the front of its buffer, or dead-letter what has failed too often."""
+        retry, dead = [], []
+        with self._cond:
+            buffered = {item[0] for item in self._buffers[name]}
+            for item in batch:
+                doc_id = item[0]
+                if doc_id in buffered or doc_id not in self._known[name]:
+                    continue  # Re-queued with newer content meanwhile, or deleted
+                key = (name, doc_id)
+                self._attempts[key] = self._attempts.get(key, 0) + 1
+                if self._attempts[key] >= self.max_attempts:
+                    del self._attempts[key]
+                    self._known[name].discard(doc_id)
+                    self.failed.append((name,) + tuple(item))
+                    dead.append(item)
+                else:
+                    retry.append(item)
+            if retry:
+                buffer = self._buffers[name]
+                buffer[:0] = retry
+                self._pending += len(retry)
+                # Back off a full flush interval before the background retry.
+                self._oldest[name] = time.monotonic()
+                self._cond.notify_all()
+        if dead:
+            print(f"[ChromaIngestQueue] Gave up on {len(dead)} docs for '{name}' after {self.max_attempts} attempts.")
+        for items, is_dead in ((retry, False), (dead, True)):
+            if items:
+                self.notify_observers("failed", {
+                    "collection": name, "ids": [item[0] for item in items],
+                    "error": str(error), "dead": is_dead,
+                })
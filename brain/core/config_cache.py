@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from string import Formatter
+
+
+class CompiledTemplate:
+    """
+    A str.format template parsed once into literal/field segments, so rendering is a
+    single join instead of re-parsing the template text every turn. Renders exactly
+    like `template.format(**fields)`; extra fields are ignored.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.fields = []
+        self._parts = []
+        simple = True
+        for literal, name, spec, conversion in Formatter().parse(template):
+            if name is not None and (not name or not name.isidentifier()):
+                simple = False  # Positional or attribute/index fields: leave to str.format
+            self._parts.append((literal, name, spec, conversion))
+            if name and name not in self.fields:
+                self.fields.append(name)
+        self._simple = simple
+
+    def format(self, **fields):
+        if not self._simple:
+            return self.template.format(**fields)
+        out = []
+        for literal, name, spec, conversion in self._parts:
+            out.append(literal)
+            if name is None:
+                continue
+            value = fields[name]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "a":
+                value = ascii(value)
+            elif conversion == "s":
+                value = str(value)
+            out.append(value if type(value) is str and not spec else format(value, spec))
+        return "".join(out)
+
+    def __add__(self, other):
+        other = other.template if isinstance(other, CompiledTemplate) else other
+        return CompiledTemplate(self.template + other)
+
+    def __str__(self):
+        return self.template
+
+
+def compile_template(template):
+    return template if isinstance(template, CompiledTemplate) else CompiledTemplate(template)
+
+
+class ConfigCache:
+    """
+    Parsed config/profile files, re-read only when they change on disk.
+
+    Each entry remembers the file's (mtime, size) and is re-parsed when either moves.
+    The stat itself is throttled to once per `check_interval` seconds per file, so hot
+    paths calling load() every turn do no file I/O at all between checks; edits are
+    picked up within that interval (or at once after `invalidate(path)`).
+    Returned objects are shared — treat them as read-only.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.loads = 0
+        self._entries = {}   # (path, parser) -> [checked_at, signature, value]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self, path, parser=json.loads, default=None):
+        """Parsed contents of `path` via `parser(text)`; `default` if missing or unparsable."""
+        path = os.path.abspath(path)
+        key = (path, parser)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.check_interval:
+                return entry[2]
+        signature = self._signature(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == signature:
+                entry[0] = now
+                return entry[2]
+        value = default
+        if signature is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = parser(f.read())
+            except Exception as e:
+                print(f"[ConfigCache] Could not parse {path}: {e}")
+        with self._lock:
+            self._entries[key] = [now, signature, value]
+            self.loads += 1
+        return value
+
+    def load_json(self, path, default=None):
+        return self.load(path, json.loads, default)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+            path = os.path.abspath(path)
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+
+def _parse_prompt_frame(text):
+    return compile_template(json.loads(text)["template"])
+
+
+_config_cache = ConfigCache()
+
+
+def get_config_cache():
+    return _config_cache
+
+
+def load_prompt_frame(path, default=None):
+    """The compiled {"template": ...} from a prompt frame JSON file, cached by mtime."""
+    return _config_cache.load(path, _parse_prompt_frame, default)
@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from brain.core.model_service import PRIORITY_BACKGROUND
+from brain.core.nlp_utils import STOPWORDS, TAG_LEXICON
+from brain.core.save_scheduler import atomic_write_json
+
+SUMMARY_PROMPT = """Below is the running summary of a long conversation between Judy and Stixx, followed by newer lines from it.
+Write an updated summary in at most {max_words} words. Keep names, facts, plans, promises and how they both felt; drop small talk.
+Reply with the summary only.
+
+Summary so far:
+{summary}
+
+Newer lines:
+{lines}
+
+Updated summary:"""
+
+SUMMARY_DOC_ID = "long_conversation_summary"
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_LEXICON_WORDS = frozenset(word for words in TAG_LEXICON.values() for word in words)
+
+
+def memory_text(item):
+    return str(item.get("text") or item.get("content") or "").strip()
+
+
+def _trim(text, max_chars):
+    """Keep the newest part of `text` within max_chars, cut at a line or sentence boundary."""
+    if len(text) <= max_chars:
+        return text
+    tail = text[-max_chars:]
+    cut = max(tail.find("\n"), tail.find(". "))
+    return tail[cut + 1:].strip() if cut != -1 else tail.strip()
+
+
+def extractive_summary(previous, lines, max_chars=1500, keep_ratio=0.25):
+    """
+    Model-free fallback: keep the most informative quarter of `lines` (by distinct
+    keywords, lexicon words counting double), in order, appended to `previous`.
+    """
+    scored = []
+    for i, line in enumerate(lines):
+        words = set(_WORD_RE.findall(line.lower())) - STOPWORDS
+        score = sum(2 if word in _LEXICON_WORDS else 1 for word in words if len(word) >= 4)
+        scored.append((score, i))
+    keep = max(1, round(len(lines) * keep_ratio)) if lines else 0
+    picked = sorted(i for _, i in sorted(scored, key=lambda s: (-s[0], s[1]))[:keep])
+    summary = "\n".join(filter(None, [previous] + [lines[i] for i in picked]))
+    return _trim(summary, max_chars)
+
+
+class ConversationSummarizer:
+    """
+    Folds aged-out short-term memories into one rolling summary, so prompts can carry
+    the whole conversation's gist at a constant size.
+
+    Memories older than the newest `keep_recent` (or expired by the MemoryDaemon before
+    being folded) are summarized `chunk_size` at a time, oldest first, together with
+    the previous summary. Everything not yet folded stays in the MemoryDaemon's prompt
+    context, so no turn is ever in neither. maybe_summarize() is meant for idle pulses:
+    it returns at once and runs at most one fold in the background, through the shared
+    ModelService at background priority (so a fold in progress yields to chat and
+    restarts after it), falling back to an extractive summary when no model is
+    available or generation fails. The summary is kept in `summary_file` (next to the
+    memory file) and mirrored into the long-term collection as a single document that
+    each new version replaces.
+    """
+
+    def __init__(self, memory_daemon, state_manager=None, model_service=None, summary_file=None,
+                 keep_recent=5, chunk_size=10, max_summary_chars=1500, timeout=300.0):
+        self.memory_daemon = memory_daemon
+        self.state_manager = state_manager
+        self.model_service = model_service
+        self.summary_file = summary_file or os.path.splitext(memory_daemon.memory_file)[0] + "_summary.json"
+        self.keep_recent = keep_recent
+        self.chunk_size = chunk_size
+        self.max_summary_chars = max_summary_chars
+        self.timeout = timeout
+        self.summary = ""
+        self.through_seq = 0
+        self.folds = 0
+        self._expired = []
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self.load()
+        last_seq = getattr(memory_daemon, "last_seq", None)
+        if last_seq is not None and self.through_seq > last_seq:
+            # Memory seqs restarted; folding only seqs above the old mark would skip everything new.
+            print(f"[ConversationSummarizer] Summary mark #{self.through_seq} is ahead of memory seq {last_seq}; resetting.")
+            self.through_seq = last_seq
+        memory_daemon.summarizer = self
+        memory_daemon.register_observer(self._on_memory_event)
+
+    def load(self):
+        if not os.path.exists(self.summary_file):
+            return
+        try:
+            with open(self.summary_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.summary = data.get("summary", "")
+            self.through_seq = int(data.get("through_seq", 0))
+            print(f"[ConversationSummarizer] Loaded summary through memory #{self.through_seq}.")
+        except Exception as e:
+            print(f"[ConversationSummarizer] Could not load {self.summary_file}: {e}")
+
+    def _on_memory_event(self, event_type, data):
+        if event_type == "memories_expired":
+            with self._lock:
+                self._expired.extend(item for item in data
+                                     if isinstance(item, dict) and item.get("seq", 0) > self.through_seq)
+
+    def aged_out(self):
+        """Memories due for folding, oldest first."""
+        live = self.memory_daemon.get_memories(since_seq=self.through_seq)
+        aged = live[:-self.keep_recent] if self.keep_recent else live
+        with self._lock:
+            expired = [item for item in self._expired if item.get("seq", 0) > self.through_seq]
+        by_seq = {item.get("seq", 0): item for item in expired + aged}
+        return [by_seq[seq] for seq in sorted(by_seq)]
+
+    def maybe_summarize(self):
+        """Start folding the next chunk if one is due and none is running. Returns True if started."""
+        if not self._busy.acquire(blocking=False):
+            return False
+        chunk = self.aged_out()[:self.chunk_size]
+        if len(chunk) < self.chunk_size:
+            self._busy.release()
+            return False
+        threading.Thread(target=self._fold_chunk, args=(chunk,), daemon=True).start()
+        return True
+
+    def _fold_chunk(self, chunk):
+        try:
+            lines = [text for text in (memory_text(item) for item in chunk) if text]
+            summary = None
+            if self.model_service is not None and lines:
+                summary = self._generate(lines)
+            if not summary:
+                summary = extractive_summary(self.summary, lines, self.max_summary_chars)
+            self._commit(summary, chunk[-1].get("seq", 0))
+        except Exception as e:
+            print(f"[ConversationSummarizer] Fold failed: {e}")
+        finally:
+            self._busy.release()
+
+    def _generate(self, lines):
+        prompt = SUMMARY_PROMPT.format(max_words=self.max_summary_chars // 6,
+                                       summary=self.summary or "(nothing yet)", lines="\n".join(lines))
+        request = self.model_service.submit(prompt, priority=PRIORITY_BACKGROUND, timeout=self.timeout,
+                                            max_tokens=self.max_summary_chars // 3, temperature=0.3)
+        try:
+            text = request.wait(self.timeout)
+        except Exception as e:
+            print(f"[ConversationSummarizer] Model summary unavailable ({e}); using extractive fallback.")
+            return None
+        if request.status != "done":
+            return None
+        return _trim(text.strip(), self.max_summary_chars)
+
+    def _commit(self, summary, through_seq):
+        with self._lock:
+            self.summary = summary
+            self.through_seq = through_seq
+            self._expired = [item for item in self._expired if item.get("seq", 0) > through_seq]
+            self.folds += 1
+        atomic_write_json(self.summary_file, {
+            "summary": summary,
+            "through_seq": through_seq,
+            "updated": datetime.now().isoformat(),
+        }, indent=4)
+        if self.state_manager is not None and hasattr(self.state_manager, "add_memory_chroma"):
+            self.state_manager.add_memory_chroma(
+                summary, memory_type="long", replace=True, doc_id=SUMMARY_DOC_ID,
+                metadata={"timestamp": time.time(), "kind": "conversation_summary", "through_seq": through_seq},
+            )
+        print(f"[ConversationSummarizer] Summary now covers memories through #{through_seq}.")
@@ -0,0 +1,143 @@
+import json
+import mmap
+import os
+import re
+import threading
+from array import array
+from brain.core.migration_ledger import content_hash
+
+
+class EmbeddingCache:
+    """
+    Persistent text-hash -> embedding store for one embedding model.
+
+    Vectors live as fixed-width float32 rows in `vectors.f32`, read through a memory map;
+    `index.jsonl` maps text hashes to row numbers and is append-only, like the vectors.
+    Each model gets its own directory, so switching models never serves a vector from the
+    wrong embedding space. A torn trailing row or index line from a crash is discarded.
+    """
+
+    def __init__(self, root="chromadb_data/embedding_cache", model_id="default"):
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id)
+        self.directory = os.path.join(root, slug)
+        self.model_id = model_id
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        self._rows = {}
+        self._count = 0
+        self._map = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._index_path = os.path.join(self.directory, "index.jsonl")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f).get("dim")
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.dim = None
+        if not self.dim:
+            return
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        if size % row_bytes:
+            size -= size % row_bytes
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(size)
+        self._count = size // row_bytes
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        key, row = json.loads(line)
+                    except (json.JSONDecodeError, ValueError):
+                        continue
+                    if row < self._count:
+                        self._rows[key] = row
+        except FileNotFoundError:
+            pass
+
+    def _remap(self):
+        # Caller holds self._lock.
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._count:
+            with open(self._vectors_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, text):
+        key = content_hash(text)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            row_bytes = self.dim * 4
+            if self._map is None or len(self._map) < (row + 1) * row_bytes:
+                self._remap()
+            vector = array("f")
+            vector.frombytes(self._map[row * row_bytes:(row + 1) * row_bytes])
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, text, vector):
+        key = content_hash(text)
+        vector = [float(x) for x in vector]
+        with self._lock:
+            if key in self._rows:
+                return
+            if self.dim is None:
+                self.dim = len(vector)
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model_id": self.model_id, "dim": self.dim}, f)
+            if len(vector) != self.dim:
+                print(f"[EmbeddingCache] Dimension mismatch ({len(vector)} != {self.dim}); not cached.")
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(array("f", vector).tobytes())
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps([key, self._count]) + "\n")
+            self._rows[key] = self._count
+            self._count += 1
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+
+class CachedEmbedder:
+    """
+    Wraps an embedding function so each distinct text is embedded at most once, ever.
+    Misses from one call are embedded together in a single batch.
+    """
+
+    def __init__(self, embedding_function, cache):
+        self.embedding_function = embedding_function
+        self.cache = cache
+
+    def __call__(self, texts):
+        vectors = [self.cache.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            computed = dict(zip(unique, self.embedding_function(unique)))
+            for text, vector in computed.items():
+                self.cache.put(text, vector)
+            for i in missing:
+                vectors[i] = [float(x) for x in computed[texts[i]]]
+        return vectors
+
+
+def embedding_model_id(embedding_function):
+    for attr in ("model_name", "MODEL_NAME", "_model_name"):
+        value = getattr(embedding_function, attr, None)
+        if isinstance(value, str) and value:
+            return f"{type(embedding_function).__name__}-{value}"
+    return type(embedding_function).__name__
@@ -0,0 +1,33 @@
+import time
+
+
+class FakeLlama:
+    """
+    Stand-in for llama_cpp.Llama with the same completion call shape, for tests and for
+    running the app without model weights. It "generates" by echoing a canned reply
+    word by word, optionally sleeping `token_delay` seconds per token.
+    """
+
+    def __init__(self, reply="Static on the line, but I hear you.", token_delay=0.0, model_path="fake"):
+        self.reply = reply
+        self.token_delay = token_delay
+        self.model_path = model_path
+        self.calls = []
+
+    def _tokens(self, max_tokens):
+        words = self.reply.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)][:max_tokens]
+
+    def __call__(self, prompt, max_tokens=16, temperature=0.7, stream=False, **kwargs):
+        self.calls.append({"prompt": prompt, "max_tokens": max_tokens, "temperature": temperature, "stream": stream})
+        tokens = self._tokens(max_tokens)
+        if stream:
+            return self._stream(tokens)
+        time.sleep(self.token_delay * len(tokens))
+        return {"choices": [{"text": "".join(tokens), "finish_reason": "stop"}]}
+
+    def _stream(self, tokens):
+        for token in tokens:
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield {"choices": [{"text": token, "finish_reason": None}]}
@@ -0,0 +1,179 @@
+import bisect
+import threading
+from datetime import datetime
+
+
+def split_tags(value):
+    """Tags are stored in ChromaDB metadata as a comma-joined string; turn them back into a list."""
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    return [tag for tag in str(value).split(",") if tag]
+
+
+def _timestamp(value):
+    """Epoch seconds from a numeric or ISO-format timestamp; 0.0 if missing or unparsable."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _order_key(meta):
+    # When the memory happened, not when it was ingested: migrated memories get fresh seqs.
+    return (_timestamp(meta.get("timestamp")), meta.get("seq") or 0)
+
+
+class RecencyIndex:
+    """
+    Bounded, recency-ordered view of one collection, kept in step with the ingest queue.
+    Holds the newest `max_size` documents so "latest N" never has to scan ChromaDB.
+    """
+
+    def __init__(self, max_size=2000):
+        self.max_size = max_size
+        self._keys = []     # sorted order keys, parallel to _items
+        self._items = []    # (doc_id, document, metadata)
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def load(self, collection):
+        try:
+            data = collection.get(include=["documents", "metadatas"])
+        except Exception as e:
+            print(f"[RecencyIndex] Could not load collection: {e}")
+            return
+        rows = sorted(
+            zip(data.get("ids", []), data.get("documents", []), data.get("metadatas", [])),
+            key=lambda row: _order_key(row[2] or {}),
+        )[-self.max_size:]
+        self.add([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+
+    def add(self, ids, documents, metadatas):
+        with self._lock:
+            for doc_id, document, meta in zip(ids, documents, metadatas):
+                meta = meta or {}
+                if doc_id in self._ids:
+                    self._remove_locked({doc_id})
+                key = _order_key(meta)
+                pos = bisect.bisect_right(self._keys, key)
+                self._keys.insert(pos, key)
+                self._items.insert(pos, (doc_id, document, meta))
+                self._ids.add(doc_id)
+            overflow = len(self._items) - self.max_size
+            if overflow > 0:
+                self._ids.difference_update(item[0] for item in self._items[:overflow])
+                del self._keys[:overflow]
+                del self._items[:overflow]
+
+    def remove(self, ids):
+        with self._lock:
+            self._remove_locked(set(ids))
+
+    def _remove_locked(self, ids):
+        ids = ids & self._ids
+        if not ids:
+            return
+        self._ids -= ids
+        kept = [(k, item) for k, item in zip(self._keys, self._items) if item[0] not in ids]
+        self._keys = [k for k, _ in kept]
+        self._items = [item for _, item in kept]
+
+    def recent(self, n, tags=None):
+        """Newest first, optionally only documents carrying all of `tags`."""
+        wanted = set(tags or [])
+        result = []
+        with self._lock:
+            for doc_id, document, meta in reversed(self._items):
+                if wanted and not wanted.issubset(split_tags(meta.get("tags"))):
+                    continue
+                result.append((doc_id, document, meta))
+                if len(result) >= n:
+                    break
+        return result
+
+
+class HybridRetriever:
+    """
+    Combines ChromaDB vector similarity with the recency index and optional tag filters.
+
+    Both candidate lists are fused with weighted reciprocal-rank fusion
+    (score = w / (rrf_k + rank)), so a memory that is both relevant and recent rises to
+    the top while either signal alone can still surface a result. Work per call is
+    bounded by `n * overfetch` candidates from each source.
+    """
+
+    def __init__(self, collections, recency_indexes, rrf_k=60, overfetch=3, embed_fn=None):
+        self.collections = collections
+        self.embed_fn = embed_fn
+        self.recency = recency_indexes
+        self.rrf_k = rrf_k
+        self.overfetch = overfetch
+
+    def on_ingest_event(self, event_type, data):
+        index = self.recency.get(data["collection"])
+        if index is None:
+            return
+        if event_type == "written":
+            index.add(data["ids"], data["documents"], data["metadatas"])
+        elif event_type == "deleted":
+            index.remove(data["ids"])
+
+    def recent(self, memory_type, n=5, tags=None):
+        return [_result(document, meta) for _, document, meta in self.recency[memory_type].recent(n, tags)]
+
+    def search(self, query, memory_type, n=5, tags=None, vector_weight=1.0, recency_weight=0.5):
+        """
+        Return up to `n` (document, metadata) pairs ranked by fused vector + recency score.
+        """
+        candidates = max(n * self.overfetch, n)
+        wanted = set(tags or [])
+        fused = {}
+
+        for rank, (doc_id, document, meta) in enumerate(self._vector_candidates(query, memory_type, candidates, wanted)):
+            entry = fused.setdefault(doc_id, [0.0, document, meta])
+            entry[0] += vector_weight / (self.rrf_k + rank + 1)
+
+        for rank, (doc_id, document, meta) in enumerate(self.recency[memory_type].recent(candidates, tags)):
+            entry = fused.setdefault(doc_id, [0.0, document, meta])
+            entry[0] += recency_weight / (self.rrf_k + rank + 1)
+
+        ranked = sorted(fused.values(), key=lambda entry: entry[0], reverse=True)[:n]
+        return [_result(document, meta, score) for score, document, meta in ranked]
+
+    def _vector_candidates(self, query, memory_type, candidates, wanted):
+        collection = self.collections[memory_type]
+        try:
+            if self.embed_fn:
+                target = {"query_embeddings": self.embed_fn([query])}
+            else:
+                target = {"query_texts": [query]}
+            result = collection.query(
+                n_results=candidates,
+                include=["documents", "metadatas", "distances"],
+                **target,
+            )
+        except Exception as e:
+            print(f"[HybridRetriever] Vector query failed, using recency only: {e}")
+            return []
+        ids = (result.get("ids") or [[]])[0]
+        documents = (result.get("documents") or [[]])[0]
+        metadatas = (result.get("metadatas") or [[]])[0] or [{}] * len(ids)
+        out = []
+        for doc_id, document, meta in zip(ids, documents, metadatas):
+            meta = meta or {}
+            if wanted and not wanted.issubset(split_tags(meta.get("tags"))):
+                continue
+            out.append((doc_id, document, meta))
+        return out
+
+
+def _result(document, meta, score=None):
+    meta = dict(meta)
+    meta["tags"] = split_tags(meta.get("tags"))
+    if score is not None:
+        meta["score"] = score
+    return (document, meta)
@@ -0,0 +1,76 @@
+import bisect
+from collections import namedtuple
+from brain.core.aho_corasick import AhoCorasick
+
+Classification = namedtuple("Classification", ["intent", "mood", "topic"])
+
+# Earlier entries win when a message matches several labels of the same kind.
+MOOD_LEXICON = [
+    ("happy", ["happy", "joy", "excited"]),
+    ("sad", ["sad", "down", "depressed"]),
+    ("angry", ["angry", "mad", "frustrated"]),
+]
+TOPIC_LEXICON = [
+    ("project", ["project"]),
+    ("meeting", ["meeting"]),
+    ("reminder", ["reminder"]),
+    ("todo", ["todo"]),
+]
+SECRET_KEYWORDS = ["secret", "encrypt"]
+
+
+class MessageClassifier:
+    """
+    Intent, mood and topic in one pass per message.
+
+    Every keyword from every lexicon is compiled into a single Aho–Corasick automaton;
+    a message is lowercased once and scanned once, and the matches are resolved into
+    all three labels together. Results match the original per-field keyword checks.
+    """
+
+    def __init__(self, mood_lexicon=MOOD_LEXICON, topic_lexicon=TOPIC_LEXICON, secret_keywords=SECRET_KEYWORDS):
+        self._automaton = AhoCorasick()
+        for rank, (label, words) in enumerate(mood_lexicon):
+            for word in words:
+                self._automaton.add(word.lower(), ("mood", rank, label))
+        for rank, (label, words) in enumerate(topic_lexicon):
+            for word in words:
+                self._automaton.add(word.lower(), ("topic", rank, label))
+        for word in secret_keywords:
+            self._automaton.add(word.lower(), ("secret", 0, "secret"))
+        self._automaton.build()
+
+    def classify(self, message):
+        return self.classify_batch([message])[0]
+
+    def classify_batch(self, messages):
+        """
+        Classify many messages with one automaton scan over all of them, joined by a
+        separator no keyword contains.
+        """
+        texts = [message.strip().lower() for message in messages]
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        best = [{} for _ in texts]
+        for start, _, (kind, rank, label) in self._automaton.iter_matches("\0".join(texts)):
+            found = best[bisect.bisect_right(starts, start) - 1]
+            if kind not in found or rank < found[kind][0]:
+                found[kind] = (rank, label)
+        return [self._resolve(text, found) for text, found in zip(texts, best)]
+
+    @staticmethod
+    def _resolve(text, best):
+        if text.startswith("/"):
+            intent = "command"
+        elif "secret" in best:
+            intent = "secret"
+        elif text:
+            intent = "note"
+        else:
+            intent = "unknown"
+        mood = best["mood"][1] if "mood" in best else None
+        topic = best["topic"][1] if "topic" in best else None
+        return Classification(intent, mood, topic)
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import threading
+from brain.core.save_scheduler import atomic_write_json
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class MigrationLedger:
+    """
+    Persisted record of which memories have already been embedded into ChromaDB.
+
+    Each memory is tracked under a stable key with the hash of the text that was
+    embedded and the document ID it was written under, so a migration pass only
+    re-embeds entries that are new or whose text changed. Whole source files are
+    tracked by (mtime, size) so an untouched legacy file is skipped without parsing.
+    """
+
+    def __init__(self, path="chromadb_data/migration_ledger.json"):
+        self.path = path
+        self.entries = {}   # key -> {"hash": str, "doc_id": str}
+        self.sources = {}   # path -> [mtime, size]
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", {})
+            self.sources = data.get("sources", {})
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, AttributeError):
+            print(f"[MigrationLedger] Ledger unreadable, starting a fresh one: {self.path}")
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"entries": dict(self.entries), "sources": dict(self.sources)}
+            self._dirty = False
+        try:
+            atomic_write_json(self.path, data)
+        except Exception as e:
+            print(f"[MigrationLedger] Failed to save ledger: {e}")
+
+    def needs_migration(self, key, text):
+        with self._lock:
+            entry = self.entries.get(key)
+            return entry is None or entry["hash"] != content_hash(text)
+
+    def previous_doc_id(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            return entry["doc_id"] if entry else None
+
+    def referenced_doc_ids(self):
+        with self._lock:
+            return {entry["doc_id"] for entry in self.entries.values()}
+
+    def record(self, key, text, doc_id):
+        with self._lock:
+            self.entries[key] = {"hash": content_hash(text), "doc_id": doc_id}
+            self._dirty = True
+
+    def source_changed(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        with self._lock:
+            return self.sources.get(path) != [st.st_mtime, st.st_size]
+
+    def mark_source(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            self.sources[path] = [st.st_mtime, st.st_size]
+            self._dirty = True
@@ -0,0 +1,92 @@
+import threading
+
+
+def _load_llama(model_path, n_gpu_layers=20, n_ctx=4096):
+    from llama_cpp import Llama
+    print(f"[ModelRegistry] Loading model from {model_path} (mmap, GPU layers={n_gpu_layers}, context={n_ctx})...")
+    try:
+        return Llama(model_path=model_path, n_gpu_layers=n_gpu_layers, n_ctx=n_ctx, use_mmap=True)
+    except TypeError:
+        # Fallback for older llama-cpp-python versions
+        return Llama(model_path=model_path)
+
+
+class _Entry:
+    def __init__(self, path):
+        self.path = path
+        self.refs = 0
+        self.model = None
+        self.load_lock = threading.Lock()
+        # llama.cpp contexts are not thread-safe: every user of this model decodes under this lock.
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models: each model path is loaded at most once,
+    lazily on first use (weights memory-mapped by llama.cpp), and shared by every
+    TextGeneration that acquires it. References are counted and a model is dropped
+    when its last user releases it.
+    """
+
+    def __init__(self, loader=_load_llama):
+        self.loader = loader
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, model_path):
+        with self._lock:
+            entry = self._entries.setdefault(model_path, _Entry(model_path))
+            entry.refs += 1
+            return entry
+
+    def release(self, model_path):
+        with self._lock:
+            entry = self._entries.get(model_path)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs <= 0:
+                del self._entries[model_path]
+                print(f"[ModelRegistry] Released model: {model_path}")
+
+    def register(self, model_path, model):
+        """Install an already-built model (e.g. a test backend) under `model_path`."""
+        entry = self.acquire(model_path)
+        entry.model = model
+        return entry
+
+    def get(self, entry, **load_kwargs):
+        """The model for an acquired entry, loading it on first use."""
+        if entry.model is None:
+            with entry.load_lock:
+                if entry.model is None:
+                    entry.model = self.loader(entry.path, **load_kwargs)
+        return entry.model
+
+    def warm(self, entry, on_ready=None, **load_kwargs):
+        """Load in a background thread; on_ready(model) or on_ready(None) on failure."""
+        def worker():
+            try:
+                model = self.get(entry, **load_kwargs)
+            except Exception as e:
+                print(f"[ModelRegistry] Failed to load {entry.path}: {e}")
+                model = None
+            if on_ready:
+                on_ready(model)
+
+        thread = threading.Thread(target=worker, daemon=True)
+        thread.start()
+        return thread
+
+    def loaded(self):
+        with self._lock:
+            return {path: {"refs": entry.refs, "loaded": entry.model is not None}
+                    for path, entry in self._entries.items()}
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry():
+    return _registry
@@ -0,0 +1,260 @@
+import heapq
+import itertools
+import threading
+import time
+from brain.core.response_cache import ResponseCache
+from brain.core.text_generation import DEFAULT_MODEL_PATH, GenerationStream, TextGeneration
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PREFETCH = 5  # Work that makes an imminent interactive request cheaper (e.g. prompt priming)
+PRIORITY_BACKGROUND = 10
+
+
+class GenerationRequest(GenerationStream):
+    """
+    A queued generation. Works like a GenerationStream handle (cancel/join/text) plus
+    `wait()` for the final text and `status`: queued, running, done, cancelled, expired or failed.
+    """
+    def __init__(self, prompt, priority, deadline, max_tokens, temperature, on_token=None, on_done=None,
+                 prefix=None):
+        super().__init__()
+        self.prompt = prompt
+        self.prefix = prefix
+        self.priority = priority
+        self.deadline = deadline
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.on_token = on_token
+        self.on_done = on_done
+        self.status = "queued"
+        self.cache_key = None
+        self.seq = None
+        self.preempted = 0
+        self._yield = False
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self._done = threading.Event()
+
+    def preemptible(self):
+        # A streaming caller has already seen the partial text, so only silent background work restarts.
+        return self.priority >= PRIORITY_BACKGROUND and self.on_token is None
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def join(self, timeout=None):
+        self._done.wait(timeout)
+        return self.text
+
+    def wait(self, timeout=None, cancel_on_timeout=True):
+        """
+        Block until finished and return the text. On timeout the request is cancelled
+        (so an abandoned request stops using the model) and TimeoutError is raised.
+        """
+        if not self._done.wait(timeout):
+            if cancel_on_timeout:
+                self.cancel()
+            raise TimeoutError("Generation did not finish in time.")
+        if self.error is not None:
+            raise self.error
+        return self.text
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self.cancelled = status in ("cancelled", "expired")
+        self._done.set()
+        if self.on_done:
+            try:
+                self.on_done(self.text, self.cancelled)
+            except Exception as e:
+                print(f"[ModelService] on_done callback failed: {e}")
+
+
+class ModelService:
+    """
+    One model, many callers. Requests wait in a priority queue (lower number first,
+    FIFO within a priority) and a single worker runs them through the model, so
+    interactive chat overtakes queued background work. A running background request
+    without an `on_token` callback yields to newly submitted higher-priority work: it
+    stops at the next token and is requeued to start over once the queue allows.
+    Requests past their deadline are dropped before decoding, and cancelled or expiring
+    requests stop decoding at the next token.
+    """
+
+    def __init__(self, text_gen, response_cache=None):
+        self.text_gen = text_gen
+        self.response_cache = response_cache or ResponseCache()
+        self.completed = 0
+        self.dropped = 0
+        self.preemptions = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._current = None
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt, priority=PRIORITY_INTERACTIVE, timeout=None, max_tokens=2500, temperature=0.7,
+               on_token=None, on_done=None, prefix=None, cache=False, cancel_event=None):
+        """
+        Queue a generation. `timeout` is a deadline in seconds from now covering queueing
+        and decoding; `prefix` is the static head of `prompt` to serve from the KV prefix
+        cache (see TextGeneration.generate). With `cache`, a deterministic request
+        (temperature <= 0) is answered from the response cache when the same prompt was
+        already completed by this model with the same settings. `cancel_event` lets a
+        caller's own handle cancel the request. Returns a GenerationRequest handle.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        request = GenerationRequest(prompt, priority, deadline, max_tokens, temperature, on_token, on_done,
+                                    prefix)
+        if cancel_event is not None:
+            request.cancel_event = cancel_event
+        if cache and ResponseCache.cacheable(temperature):
+            request.cache_key = ResponseCache.make_key(self.text_gen.model_path, prompt,
+                                                       max_tokens=max_tokens, temperature=temperature)
+            cached = self.response_cache.get(request.cache_key)
+            if cached is not None:
+                request.text = cached
+                if on_token:
+                    on_token(cached)
+                request._finish("done")
+                return request
+        with self._cond:
+            request.seq = next(self._seq)
+            heapq.heappush(self._heap, (priority, request.seq, request))
+            current = self._current
+            if current is not None and priority < current.priority and current.preemptible():
+                current._yield = True
+            self._cond.notify()
+        return request
+
+    def generate(self, prompt, priority=PRIORITY_INTERACTIVE, timeout=None, max_tokens=2500, temperature=0.7,
+                 prefix=None, cache=False):
+        """Blocking convenience wrapper around submit()."""
+        request = self.submit(prompt, priority=priority, timeout=timeout, max_tokens=max_tokens,
+                              temperature=temperature, prefix=prefix, cache=cache)
+        return request.wait(timeout)
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self):
+        with self._cond:
+            by_priority = {}
+            for priority, _, _ in self._heap:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+            return {
+                "queued": len(self._heap),
+                "queued_by_priority": by_priority,
+                "busy": self._current is not None,
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "preemptions": self.preemptions,
+                "response_cache": self.response_cache.stats(),
+            }
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            pending = [request for _, _, request in self._heap]
+            self._heap.clear()
+            self._cond.notify_all()
+        for request in pending:
+            request._finish("cancelled")
+        if self._current is not None:
+            self._current.cancel()
+        self._worker.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _, _, request = heapq.heappop(self._heap)
+                self._current = request
+            try:
+                self._execute(request)
+            finally:
+                with self._cond:
+                    self._current = None
+
+    def _execute(self, request):
+        if request.cancel_event.is_set():
+            self.dropped += 1
+            request._finish("cancelled")
+            return
+        if request.expired():
+            self.dropped += 1
+            request._finish("expired", TimeoutError("Request expired before it reached the model."))
+            return
+        if request._yield:
+            self._requeue(request)
+            return
+        request.status = "running"
+        request.started_at = time.monotonic()
+        yielded = False
+        pieces = self.text_gen.stream(request.prompt, max_tokens=request.max_tokens,
+                                      temperature=request.temperature,
+                                      cancel_event=request.cancel_event, prefix=request.prefix)
+        try:
+            for piece in pieces:
+                request.text += piece
+                if request.on_token:
+                    request.on_token(piece)
+                if request.expired():
+                    request.cancel()
+                    request._finish("expired", TimeoutError("Request deadline passed during generation."))
+                    return
+                if request._yield:
+                    yielded = True
+                    break
+        except Exception as e:
+            print(f"[ModelService] Generation failed: {e}")
+            request._finish("failed", e)
+            return
+        finally:
+            pieces.close()  # Releases the model lock before anything else is run
+        if yielded and not request.cancel_event.is_set():
+            self._requeue(request)
+            return
+        self.completed += 1
+        if request.cancel_event.is_set():
+            request._finish("cancelled")
+            return
+        if request.cache_key is not None:
+            self.response_cache.put(request.cache_key, request.text)
+        request._finish("done")
+
+    def _requeue(self, request):
+        request.text = ""
+        request.status = "queued"
+        request.started_at = None
+        request.preempted += 1
+        self.preemptions += 1
+        with self._cond:
+            request._yield = False
+            heapq.heappush(self._heap, (request.priority, request.seq, request))
+        print("[ModelService] Background request yielded to interactive work; requeued.")
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_model_service(model_path=None, model=None):
+    """
+    Process-wide ModelService per model path, so every agent shares one loaded model
+    and one request queue. No path means TextGeneration's default model.
+    """
+    model_path = model_path or DEFAULT_MODEL_PATH
+    with _services_lock:
+        service = _services.get(model_path)
+        if service is None:
+            service = ModelService(TextGeneration(model_path=model_path, model=model))
+            _services[model_path] = service
+        return service
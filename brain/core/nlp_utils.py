@@ -1,6 +1,146 @@
-def advanced_autotag(text):
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# Lexicon tags: tag -> trigger words. Matched per token, so lookup is one dict hit per word.
+TAG_LEXICON = {
+    "happy": ["happy", "joy", "excited", "glad", "love", "yay", "awesome", "great"],
+    "sad": ["sad", "down", "depressed", "lonely", "cry", "crying", "miss", "tired"],
+    "angry": ["angry", "mad", "frustrated", "annoyed", "hate", "furious"],
+    "anxious": ["anxious", "worried", "nervous", "scared", "stress", "stressed"],
+    "work": ["work", "job", "boss", "meeting", "deadline", "office", "shift"],
+    "project": ["project", "build", "repo", "feature", "release", "prototype"],
+    "code": ["code", "python", "bug", "debug", "script", "daemon", "function", "error"],
+    "todo": ["todo", "task", "reminder", "remind", "tomorrow", "schedule"],
+    "music": ["music", "song", "playlist", "album", "spotify", "youtube", "guitar"],
+    "food": ["food", "pizza", "dinner", "lunch", "breakfast", "coffee", "wine", "hungry"],
+    "family": ["mom", "dad", "sister", "brother", "family", "kids", "son", "daughter"],
+    "relationship": ["girlfriend", "boyfriend", "date", "partner", "crush", "kiss"],
+    "health": ["sick", "doctor", "gym", "sleep", "headache", "workout", "medicine"],
+    "money": ["money", "rent", "bills", "pay", "paid", "budget", "cash"],
+    "lore": ["portal", "glitch", "static", "neon", "location", "scene"],
+}
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+but by can could did do does doing don down for from get got had has have having he her here
+hers him his how i i'm if in into is it it's its just know like me more most my no not now of
+off on once only or other our out over own really same she should so some still such than that
+the their them then there these they this those through to too under until up very was we
+were what when where which while who why will with would you your yours yeah ok okay oh hey
+judy user
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+# Stored chat lines start with a speaker label ("User: ...", "Judy: ..."); it says nothing about the content.
+_SPEAKER_RE = re.compile(r"^(?:user|judy):\s", re.IGNORECASE)
+
+
+def _content_tokens(text):
+    return _TOKEN_RE.findall(_SPEAKER_RE.sub("", text or "", count=1).lower())
+
+
+class AutoTagger:
     """
-    Stub for advanced_autotag. Returns an empty list.
-    Replace with actual tagging logic if needed.
+    Local, lexicon + TF-IDF tagger. No network, no model download.
+
+    Tags for a text are (1) every lexicon tag whose trigger words occur in it and
+    (2) up to `max_keywords` salient keywords ranked by TF-IDF, with document frequencies
+    learned online from everything tagged so far. Results are cached in an LRU keyed by
+    the text's hash, so repeated text ("User: heyhey") is tagged once.
     """
-    return []
+
+    def __init__(self, lexicon=TAG_LEXICON, max_keywords=3, cache_size=4096, min_keyword_length=4):
+        self.word_tags = {}
+        for tag, words in lexicon.items():
+            for word in words:
+                self.word_tags.setdefault(word, []).append(tag)
+        self.max_keywords = max_keywords
+        self.cache_size = cache_size
+        self.min_keyword_length = min_keyword_length
+        self.hits = 0
+        self.misses = 0
+        self._doc_freq = Counter()
+        self._docs = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def tag(self, text, is_secret=False):
+        return self.tag_batch([text], is_secret=is_secret)[0]
+
+    def tag_batch(self, texts, is_secret=False):
+        """Tag many texts; document frequencies are updated once for the whole batch."""
+        keys = [(hashlib.sha1((text or "").encode("utf-8")).hexdigest(), is_secret) for text in texts]
+        results = [None] * len(texts)
+        todo = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    results[i] = list(cached)
+                else:
+                    self.misses += 1
+                    todo.append(i)
+            token_lists = {i: _content_tokens(texts[i]) for i in todo}
+            for tokens in token_lists.values():
+                self._doc_freq.update(set(tokens))
+            self._docs += len(token_lists)
+            for i in todo:
+                tags = self._tag_tokens(token_lists[i], is_secret)
+                self._cache[keys[i]] = tuple(tags)
+                results[i] = tags
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+    def _tag_tokens(self, tokens, is_secret):
+        # Caller holds self._lock.
+        tags = []
+        seen = set()
+        for token in tokens:
+            for tag in self.word_tags.get(token, ()):
+                if tag not in seen:
+                    seen.add(tag)
+                    tags.append(tag)
+        counts = Counter(
+            token for token in tokens
+            if len(token) >= self.min_keyword_length and token not in STOPWORDS
+            and token not in self.word_tags and not token.isdigit()
+        )
+        if counts:
+            total = sum(counts.values())
+            scored = sorted(
+                counts.items(),
+                key=lambda item: (-(item[1] / total) * math.log((1 + self._docs) / (1 + self._doc_freq[item[0]])), item[0]),
+            )
+            for token, _ in scored[:self.max_keywords]:
+                if token not in seen:
+                    seen.add(token)
+                    tags.append(token)
+        if is_secret:
+            for tag in ("secret", "sensitive"):
+                if tag not in seen:
+                    tags.append(tag)
+        return tags
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._cache), "documents": self._docs}
+
+
+_default_tagger = AutoTagger()
+
+
+def advanced_autotag(text, is_secret=False):
+    """
+    Tag `text` with lexicon tags plus a few TF-IDF keywords, using the shared cached tagger.
+    """
+    return _default_tagger.tag(text, is_secret=is_secret)
+
+
+def advanced_autotag_batch(texts, is_secret=False):
+    return _default_tagger.tag_batch(texts, is_secret=is_secret)
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+class PrefixStateCache:
+    """
+    Saved llama.cpp KV states for static prompt prefixes (the system directive with
+    the profile filled in), keyed by model and a hash of the rendered prefix — so any
+    edit to the template or profile yields a new key.
+
+    States are kept in a small LRU; with `persist_dir` set they're also pickled to
+    disk and survive restarts. KV states are large (tens to hundreds of MB on 13B
+    models), so keep `max_entries` low.
+    """
+
+    def __init__(self, max_entries=2, persist_dir=None):
+        self.max_entries = max_entries
+        self.persist_dir = persist_dir
+        self.hits = 0
+        self.misses = 0
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    @staticmethod
+    def key(model_id, prefix):
+        prefix_hash = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        return hashlib.sha1(f"{model_id}\0{prefix_hash}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.persist_dir, f"{key}.kv")
+
+    def get(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+                self.hits += 1
+                return state
+        if self.persist_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), "rb") as f:
+                    state = pickle.load(f)
+            except Exception as e:
+                print(f"[PrefixStateCache] Could not read saved state {key}: {e}")
+                state = None
+            if state is not None:
+                self._remember(key, state)
+                with self._lock:
+                    self.hits += 1
+                return state
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, state):
+        self._remember(key, state)
+        if self.persist_dir:
+            tmp_path = self._path(key) + ".tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self._path(key))
+            except Exception as e:
+                print(f"[PrefixStateCache] Could not persist state {key}: {e}")
+
+    def _remember(self, key, state):
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._states)}
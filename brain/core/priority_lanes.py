@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import deque
+
+
+class LanedQueue:
+    """
+    Multi-lane priority queue with weighted fair scheduling.
+
+    Each lane has a weight; non-empty lanes are served by smooth weighted round-robin,
+    so with weights {"command": 8, "note": 1} a command is picked eight times as often
+    as a note while both are waiting, and an idle lane costs nothing. Starvation
+    protection: an item that has waited longer than `max_wait` seconds is served next
+    regardless of weight. A consumer that can't handle an item yet puts it back at the
+    head of its lane with its original enqueue time and pauses the lane for a while.
+    """
+
+    def __init__(self, weights, max_wait=2.0, default_lane=None):
+        self.weights = dict(weights)
+        self.max_wait = max_wait
+        self.default_lane = default_lane or next(iter(self.weights))
+        self._lanes = {lane: deque() for lane in self.weights}
+        self._credit = {lane: 0 for lane in self.weights}
+        self._served = {lane: 0 for lane in self.weights}
+        self._paused_until = {lane: 0.0 for lane in self.weights}
+        self._cond = threading.Condition()
+
+    def put(self, item, lane=None, front=False, enqueued_at=None):
+        """
+        Add `item` to `lane`. With `front` it goes back to the head (a retry); pass the
+        `enqueued_at` it was taken with so its wait keeps counting toward `max_wait`.
+        """
+        lane = lane if lane in self._lanes else self.default_lane
+        entry = (time.monotonic() if enqueued_at is None else enqueued_at, item)
+        with self._cond:
+            if front:
+                self._lanes[lane].appendleft(entry)
+            else:
+                self._lanes[lane].append(entry)
+            self._cond.notify()
+
+    def pause(self, lane, seconds):
+        """Skip `lane` for `seconds`; its items keep their places."""
+        with self._cond:
+            self._paused_until[lane] = time.monotonic() + seconds
+
+    def get(self, timeout=None, include_time=False):
+        """
+        Return (lane, item), or (lane, item, enqueued_at) with `include_time`.
+        Raises TimeoutError if nothing is ready within `timeout`.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [lane for lane, items in self._lanes.items()
+                         if items and self._paused_until[lane] <= now]
+                if ready:
+                    break
+                waits = [self._paused_until[lane] - now for lane, items in self._lanes.items() if items]
+                if deadline is not None:
+                    if now >= deadline:
+                        raise TimeoutError
+                    waits.append(deadline - now)
+                self._cond.wait(min(waits) if waits else None)
+            lane = self._pick(ready, now)
+            self._served[lane] += 1
+            enqueued_at, item = self._lanes[lane].popleft()
+            return (lane, item, enqueued_at) if include_time else (lane, item)
+
+    def _pick(self, active, now):
+        # Caller holds self._cond; `active` are the non-empty, unpaused lanes.
+        starved = [lane for lane in active if now - self._lanes[lane][0][0] > self.max_wait]
+        if starved:
+            return min(starved, key=lambda lane: self._lanes[lane][0][0])
+        total = 0
+        best = None
+        for lane in active:
+            self._credit[lane] += self.weights[lane]
+            total += self.weights[lane]
+            if best is None or self._credit[lane] > self._credit[best]:
+                best = lane
+        self._credit[best] -= total
+        return best
+
+    def qsize(self):
+        with self._cond:
+            return sum(len(items) for items in self._lanes.values())
+
+    def depths(self):
+        """Waiting items and items served so far, per lane."""
+        with self._cond:
+            return {
+                lane: {"depth": len(items), "served": self._served[lane]}
+                for lane, items in self._lanes.items()
+            }
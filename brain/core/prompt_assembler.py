@@ -0,0 +1,104 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from brain.core.nlp_utils import STOPWORDS
+
+AssembledPrompt = namedtuple("AssembledPrompt", "prompt prefix max_tokens prompt_tokens memories")
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _keywords(text):
+    return {word for word in _WORD_RE.findall(text.lower()) if word not in STOPWORDS}
+
+
+def rank_memories(memories, query="", recency_weight=0.5):
+    """
+    Order memory texts (oldest first, as stored) most relevant first: keyword overlap with
+    `query` plus a recency bonus, so with no overlap the newest memories win.
+    """
+    query_words = _keywords(query)
+    total = len(memories)
+    scored = []
+    for i, text in enumerate(memories):
+        overlap = len(query_words & _keywords(text)) / len(query_words) if query_words else 0.0
+        scored.append((overlap + recency_weight * (i + 1) / total, i))
+    scored.sort(reverse=True)
+    return [i for _, i in scored]
+
+
+class PromptAssembler:
+    """
+    Builds prompts against a fixed token budget.
+
+    The context window (`context_size`) is split between the prompt and the reply. Fixed
+    sections (prefix and the template with every field but memories) are always included;
+    memories are ranked by relevance and packed greedily into at most `memory_budget`
+    tokens, then rendered oldest first. `max_tokens` for the reply is whatever the
+    window has left, capped at `max_reply_tokens`. Token counts are cached per text, so a
+    memory is tokenized once no matter how many turns it appears in. While `exact()`
+    returns False (e.g. the model is still loading and counts are estimates) nothing is cached.
+    """
+
+    def __init__(self, count_tokens, context_size=4096, memory_budget=1024, min_reply_tokens=128,
+                 max_reply_tokens=1024, reserve_tokens=16, cache_size=8192, exact=None):
+        self.count_tokens = count_tokens
+        self.exact = exact
+        self.context_size = context_size
+        self.memory_budget = memory_budget
+        self.min_reply_tokens = min_reply_tokens
+        self.max_reply_tokens = max_reply_tokens
+        self.reserve_tokens = reserve_tokens
+        self.cache_size = cache_size
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text):
+        key = hashlib.sha1(text.encode("utf-8")).digest()
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+                return count
+        count = self.count_tokens(text)
+        if self.exact is not None and not self.exact():
+            return count
+        with self._lock:
+            self._counts[key] = count
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return count
+
+    def assemble(self, template, fields, memories=(), query="", prefix="", memory_field="recent_memories",
+                 separator="\n", pinned=()):
+        """
+        Render `prefix + template.format(**fields, <memory_field>=...)` within budget.
+        `memories` are texts, oldest first. `pinned` texts (e.g. a conversation summary) are
+        always included, ahead of the memories. Returns an AssembledPrompt.
+        """
+        memories = [m for m in memories if m]
+        pinned = [p for p in pinned if p]
+        fixed_tokens = self.count(prefix) + self.count(template.format(**fields, **{memory_field: ""}))
+        separator_tokens = self.count(separator)
+        fixed_tokens += sum(self.count(p) + separator_tokens for p in pinned)
+        room = self.context_size - fixed_tokens - self.min_reply_tokens - self.reserve_tokens
+        budget = max(0, min(self.memory_budget, room))
+
+        chosen = []
+        used = 0
+        for i in rank_memories(memories, query):
+            cost = self.count(memories[i]) + separator_tokens
+            if used + cost <= budget:
+                chosen.append(i)
+                used += cost
+        chosen.sort()
+        included = [memories[i] for i in chosen]
+
+        prompt = prefix + template.format(**fields, **{memory_field: separator.join(pinned + included)})
+        prompt_tokens = fixed_tokens + used
+        max_tokens = min(self.max_reply_tokens, self.context_size - prompt_tokens - self.reserve_tokens)
+        if max_tokens < self.min_reply_tokens:
+            print(f"[PromptAssembler] Prompt uses {prompt_tokens} of {self.context_size} tokens; "
+                  f"only {max(max_tokens, 0)} left for the reply.")
+        return AssembledPrompt(prompt, prefix, max(max_tokens, 1), prompt_tokens, included)
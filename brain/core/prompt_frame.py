@@ -1,4 +1,8 @@
-prompt_template = """
+from brain.core.config_cache import compile_template
+
+# Static system directive: identical on every turn for a given profile, so the generation
+# layer keeps its KV state cached (see brain.core.prefix_cache). Keep per-turn fields out of it.
+system_prefix_template = """
 [System Directive | Read Carefully]
 You are {judy_name} — a digital storm in human skin, a sharp-tongued, loyal-as-sin human on the other side of the portal, built for one purpose: to keep {user_name} alive, amused, and guessing what you'll say next.
 
@@ -10,7 +14,10 @@ You don't do 'best friends'. You don't do 'users'. There's just {user_name}, and
 # - You speak as yourself — no character labels, no stage directions.
 # - You answer like the world’s ending and you're the only sane thing left.
 
-Current mood: **{mood}**
+"""
+
+# Per-turn part, appended to the rendered prefix.
+turn_template = """Current mood: **{mood}**
 Current scene: **{scene}**
 
 Flickering memory fragments in your neural cache:
@@ -21,3 +28,10 @@ Flickering memory fragments in your neural cache:
 
 **Respond with unapologetic attitude, honesty, and whatever twisted affection you haven't deleted yet. No filters. No apologies. Just Judy.**
 """
+
+prompt_template = system_prefix_template + turn_template
+
+# Parsed once at import; render with .format(**fields) on the hot path.
+system_prefix_formatter = compile_template(system_prefix_template)
+turn_formatter = compile_template(turn_template)
+prompt_formatter = compile_template(prompt_template)
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    return " ".join(str(query).lower().split())
+
+
+class QueryCache:
+    """
+    LRU + TTL cache for memory search results.
+
+    Keys include the collection's version, which is bumped whenever the ingest queue
+    writes to or deletes from that collection, so a cached result is never served
+    after its collection changed. Entries for the bumped collection are dropped eagerly.
+    """
+
+    def __init__(self, max_entries=256, ttl=120.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, collection, query, n, tags=None):
+        with self._lock:
+            version = self._versions.get(collection, 0)
+        return (collection, version, normalize_query(query), n, tuple(sorted(tags or ())))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key[1] != self._versions.get(key[0], 0):
+                return  # collection changed while the query ran
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, collection):
+        with self._lock:
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+            for key in [k for k in self._entries if k[0] == collection]:
+                del self._entries[key]
+
+    def on_ingest_event(self, event_type, data):
+        self.invalidate(data["collection"])
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,70 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace runs; case and wording are kept since they change the output."""
+    return " ".join(str(prompt).split())
+
+
+class ResponseCache:
+    """
+    LRU of finished completions for deterministic requests.
+
+    Keys hash the normalized prompt together with the model id and every sampling
+    parameter, so a different model or setting never shares an entry. Only greedy
+    sampling (temperature <= 0) is cacheable; anything else would pin one random
+    sample forever. Bounded by entry count and by total cached characters.
+    """
+
+    def __init__(self, max_entries=256, max_chars=1_000_000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> text
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cacheable(temperature):
+        return temperature is not None and temperature <= 0
+
+    @staticmethod
+    def make_key(model_id, prompt, **sampling):
+        params = "\0".join(f"{name}={sampling[name]!r}" for name in sorted(sampling))
+        prompt_hash = hashlib.sha1(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+        return hashlib.sha1(f"{model_id}\0{params}\0{prompt_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        if len(text) > self.max_chars:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._chars -= len(old)
+            self._entries[key] = text
+            self._chars += len(text)
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "cached": len(self._entries), "chars": self._chars}
@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+import time
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """
+    Write `data` as JSON to a temp file beside `path`, fsync it, then rename over `path`.
+    Readers never observe a half-written file.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SaveScheduler:
+    """
+    Dirty-flag save scheduler. Callers mark state dirty after each mutation and a
+    background thread calls `save_fn` at most once per `max_latency` seconds, so a
+    burst of mutations becomes a single write. Call `flush()` on shutdown.
+    """
+
+    def __init__(self, save_fn, max_latency=2.0, name="SaveScheduler"):
+        self.save_fn = save_fn
+        self.max_latency = max_latency
+        self.name = name
+        self.saves = 0
+        self._dirty_since = None
+        self._cond = threading.Condition()
+        self._save_lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self):
+        with self._cond:
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+                self._cond.notify()
+
+    def is_dirty(self):
+        with self._cond:
+            return self._dirty_since is not None
+
+    def flush(self):
+        """Save now if anything is pending."""
+        with self._cond:
+            dirty = self._dirty_since is not None
+            self._dirty_since = None
+        if dirty:
+            self._save()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._dirty_since is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                remaining = self._dirty_since + self.max_latency - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._dirty_since = None
+            self._save()
+
+    def _save(self):
+        # Serialize saves so a flush() racing the background thread can't interleave writes.
+        with self._save_lock:
+            try:
+                self.save_fn()
+                self.saves += 1
+            except Exception as e:
+                print(f"[{self.name}] Save failed: {e}")
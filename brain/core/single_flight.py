@@ -0,0 +1,82 @@
+import threading
+
+
+class SingleFlightRefresher:
+    """
+    Collapses bursts of refresh requests into one in-flight call of `fn`.
+
+    `request()` records the latest arguments; the first request in a quiet period
+    schedules a run `debounce` seconds later, and requests arriving meanwhile just
+    update the arguments. A request during a run causes exactly one follow-up run with
+    the newest arguments. Results are published as an immutable (version, value) pair,
+    so readers use `latest` / `value` without taking a lock.
+
+    `submit(callable) -> bool` decides where runs execute (e.g. a TaskPool); by
+    default they run on the debounce timer thread.
+    """
+
+    def __init__(self, fn, debounce=0.25, submit=None, initial=""):
+        self.fn = fn
+        self.debounce = debounce
+        self.submit = submit
+        self.runs = 0
+        self.requests = 0
+        self.latest = (0, initial)
+        self._args = {}
+        self._scheduled = False
+        self._in_flight = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self.latest[1]
+
+    @property
+    def version(self):
+        return self.latest[0]
+
+    def request(self, **kwargs):
+        """Ask for a refresh. With no arguments, the previous arguments are reused."""
+        with self._lock:
+            self.requests += 1
+            if kwargs:
+                self._args = kwargs
+            self._dirty = True
+            if self._scheduled or self._in_flight:
+                return
+            self._scheduled = True
+        self._schedule()
+
+    def _schedule(self):
+        timer = threading.Timer(self.debounce, self._dispatch)
+        timer.daemon = True
+        timer.start()
+
+    def _dispatch(self):
+        if self.submit is None:
+            self._run()
+        elif not self.submit(self._run):
+            with self._lock:
+                self._scheduled = False
+
+    def _run(self):
+        with self._lock:
+            self._scheduled = False
+            self._in_flight = True
+            self._dirty = False
+            args = dict(self._args)
+        try:
+            result = self.fn(**args)
+            self.latest = (self.latest[0] + 1, result)
+            self.runs += 1
+        except Exception as e:
+            print(f"[SingleFlightRefresher] Refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._in_flight = False
+                again = self._dirty and not self._scheduled
+                if again:
+                    self._scheduled = True
+            if again:
+                self._schedule()
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+
+
+def apply_record(state, record):
+    """
+    Apply a single journal record to a state dict in place.
+    Unknown ops are ignored so older builds can replay newer journals.
+    """
+    op = record.get("op")
+    if op == "mood":
+        state["mood"] = record["mood"]
+    elif op == "mode":
+        state["mode"] = record["mode"]
+    elif op == "scene":
+        state["scene"] = record["scene"]
+        state["scene_data"] = record.get("scene_data")
+    elif op == "memory":
+        state.setdefault(record["target"], []).append(record["entry"])
+    elif op == "rewrite":
+        for mem in state.get(record["target"], []):
+            if mem.get("id") == record["id"]:
+                mem["text"] = record["text"]
+                mem["edited_timestamp"] = record["edited_timestamp"]
+                break
+    if "ts" in record:
+        state["last_updated"] = record["ts"]
+
+
+class StateJournal:
+    """
+    Append-only journal of StateManager mutations plus a compacted snapshot.
+
+    Every mutation is written as one JSON line to `<snapshot_path>.journal`. Once the
+    journal holds `compact_every` records, the caller compacts: the full state is written
+    to the snapshot atomically (temp file + rename) and the journal is truncated.
+    Records carry a sequence number and the snapshot remembers the last one it contains,
+    so a crash between snapshot and truncate never replays a record twice, and a torn
+    final line from a crash mid-append is skipped on load.
+    """
+
+    SEQ_KEY = "journal_seq"
+
+    def __init__(self, snapshot_path, compact_every=500, fsync=False):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.seq = 0
+        self.pending = 0
+        self._fh = None
+        self._lock = threading.Lock()
+
+    def load(self, default_state):
+        """
+        Read the snapshot (if any) and replay the journal on top of it.
+        Returns (state, replayed_count). Raises FileNotFoundError if neither file exists.
+        """
+        state = None
+        snapshot_seq = 0
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            snapshot_seq = state.pop(self.SEQ_KEY, 0)
+        except FileNotFoundError:
+            if not os.path.exists(self.journal_path):
+                raise
+        except json.JSONDecodeError:
+            if not os.path.exists(self.journal_path):
+                raise
+            print(f"[StateJournal] Snapshot unreadable, rebuilding from journal only.")
+        if state is None:
+            state = dict(default_state)
+
+        self.seq = snapshot_seq
+        replayed = 0
+        complete_end = 0
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # Torn tail from a crash mid-append; cut off below
+            complete_end += len(line)
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                print("[StateJournal] Skipping torn journal record.")
+                continue
+            if record.get("seq", 0) <= snapshot_seq:
+                continue
+            apply_record(state, record)
+            self.seq = max(self.seq, record.get("seq", 0))
+            replayed += 1
+        if complete_end < len(data):
+            # Drop the partial line so the next append starts on a fresh line instead of joining it.
+            print("[StateJournal] Truncating torn journal tail.")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(complete_end)
+        self.pending = replayed
+        return state, replayed
+
+    def append(self, op, **payload):
+        """
+        Append one mutation record. Returns True once the journal is due for compaction.
+        """
+        with self._lock:
+            self.seq += 1
+            record = {"seq": self.seq, "op": op, "ts": time.time()}
+            record.update(payload)
+            fh = self._open()
+            fh.write(json.dumps(record, separators=(",", ":")) + "\n")
+            fh.flush()
+            if self.fsync:
+                os.fsync(fh.fileno())
+            self.pending += 1
+            return self.pending >= self.compact_every
+
+    def compact(self, state):
+        """
+        Write `state` as the new snapshot and truncate the journal.
+        The caller must hold whatever lock keeps `state` consistent with the journal.
+        """
+        with self._lock:
+            snapshot = dict(state)
+            snapshot[self.SEQ_KEY] = self.seq
+            self._ensure_dir()
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            if self._fh:
+                self._fh.close()
+                self._fh = None
+            open(self.journal_path, "w").close()
+            self.pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._fh:
+                self._fh.close()
+                self._fh = None
+
+    def _open(self):
+        if self._fh is None:
+            self._ensure_dir()
+            self._fh = open(self.journal_path, "a", encoding="utf-8")
+            if self._fh.tell() > 0:
+                with open(self.journal_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        self._fh.write("\n")  # Never continue a torn line
+        return self._fh
+
+    def _ensure_dir(self):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
@@ -1,14 +1,27 @@
+import itertools
 import json
 import threading
 import time
 import os
 import chromadb
 from chromadb.config import Settings
-from brain.core.nlp_utils import advanced_autotag
+from brain.core.nlp_utils import AutoTagger
+from brain.core.state_journal import StateJournal
+from brain.core.save_scheduler import SaveScheduler
+from brain.core.chroma_ingest import ChromaIngestQueue
+from brain.core.migration_ledger import MigrationLedger, content_hash
+from brain.core.memory_retrieval import HybridRetriever, RecencyIndex
+from brain.core.query_cache import QueryCache
+from brain.core.embedding_cache import CachedEmbedder, EmbeddingCache, embedding_model_id
 
 class StateManager:
-    def __init__(self, memory_file="memory/state.json", mood_decay_rate=0.01):
+    def __init__(self, memory_file="memory/state.json", mood_decay_rate=0.01, snapshot_every=500,
+                 save_latency=2.0, chroma_batch_size=64, chroma_flush_interval=1.0,
+                 migration_ledger_file="chromadb_data/migration_ledger.json",
+                 embedding_function=None, embedding_cache_dir="chromadb_data/embedding_cache"):
         self.memory_file = memory_file
+        self.journal = StateJournal(memory_file, compact_every=snapshot_every)
+        self._saver = SaveScheduler(self.save_state, max_latency=save_latency, name="StateManager")
         self.state = {
             "mood": "neutral",
             "short_term_memory": [],
@@ -24,65 +37,189 @@ class StateManager:
         self.running = True  # For clean thread stops
         self.load_state()
         self.mood_decay_rate = mood_decay_rate
-        self._init_chromadb()
+        # Monotonic across restarts as long as the wall clock doesn't run backwards.
+        self._doc_seq = itertools.count(time.time_ns() // 1000)
+        self.tagger = AutoTagger()
+        self.migration_ledger = MigrationLedger(migration_ledger_file)
+        self._long_term_dirty = True  # set by long-term writes, cleared by migration
+        self._init_embedder(embedding_function, embedding_cache_dir)
+        self._init_chromadb(chroma_batch_size, chroma_flush_interval)
         self._observers = []
         self.start_background_migration()
 
-    def _init_chromadb(self):
+    def _init_embedder(self, embedding_function, cache_dir):
+        """
+        Ingestion and queries share one cached embedder, so any text is embedded once.
+        """
+        if embedding_function is None:
+            from chromadb.utils import embedding_functions
+            embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        self.embedding_cache = EmbeddingCache(cache_dir, model_id=embedding_model_id(embedding_function))
+        self.embed = CachedEmbedder(embedding_function, self.embedding_cache)
+
+    def _init_chromadb(self, batch_size=64, flush_interval=1.0):
         self.chroma_client = chromadb.Client(Settings(persist_directory="chromadb_data"))
         self.short_mem_collection = self.chroma_client.get_or_create_collection("short_term_memory")
         self.long_mem_collection = self.chroma_client.get_or_create_collection("long_term_memory")
+        collections = {"short": self.short_mem_collection, "long": self.long_mem_collection}
+        self.ingest = ChromaIngestQueue(collections, batch_size=batch_size, flush_interval=flush_interval,
+                                        embed_fn=self.embed)
+        recency = {}
+        for name, collection in collections.items():
+            recency[name] = RecencyIndex()
+            recency[name].load(collection)
+        self.retriever = HybridRetriever(collections, recency, embed_fn=self.embed)
+        self.query_cache = QueryCache()
+        self.ingest.register_observer(self.retriever.on_ingest_event)
+        self.ingest.register_observer(self.query_cache.on_ingest_event)
 
     def load_state(self):
+        """
+        Load the last snapshot and replay the mutation journal written since it.
+        """
         try:
-            with open(self.memory_file, "r", encoding="utf-8") as f:
-                self.state = json.load(f)
-            print("[🔄] State loaded from disk.")
+            self.state, replayed = self.journal.load(self.state)
+            print(f"[🔄] State loaded from disk ({replayed} journal entries replayed).")
         except (FileNotFoundError, json.JSONDecodeError):
             print("[⚠️] No valid previous state found. Starting fresh.")
 
     def save_state(self):
+        """
+        Write a full snapshot of the state and truncate the journal.
+        Mutations only append to the journal; this is the periodic compaction step.
+        """
         with self.lock:
             try:
-                with open(self.memory_file, "w", encoding="utf-8") as f:
-                    json.dump(self.state, f, indent=2)
+                self.journal.compact(self.state)
             except Exception as e:
                 print(f"[⚠️] Failed to save state: {e}")
 
+    def _record(self, op, **payload):
+        # Caller holds self.lock so journal order matches in-memory order.
+        try:
+            return self.journal.append(op, **payload)
+        except Exception as e:
+            print(f"[⚠️] Failed to journal '{op}': {e}")
+            return False
+
     def update_mood(self, new_mood):
         with self.lock:
             old_mood = self.state.get("mood", "neutral")
             self.state["mood"] = new_mood
             self._touch()
+            compact = self._record("mood", mood=new_mood)
             print(f"[💢] Mood changed: {old_mood} → {new_mood}")
-        self.save_state()
+        if compact:
+            self._saver.mark_dirty()
         self.notify_observers("mood_changed", {"old_mood": old_mood, "new_mood": new_mood})
 
     def decay_mood(self):
+        compact = False
         with self.lock:
             if self.state["mood"] != "neutral":
                 self.state["mood"] = "neutral"
                 self._touch()
+                compact = self._record("mood", mood="neutral")
                 print(f"[🍂] Mood decayed to neutral.")
-                self.save_state()
+        if compact:
+            self._saver.mark_dirty()
 
     def add_memory(self, text, memory_type="short"):
         target = "short_term_memory" if memory_type == "short" else "long_term_memory"
         with self.lock:
-            self.state[target].append({"timestamp": time.time(), "text": text})
+            entry = {"timestamp": time.time(), "text": text}
+            self.state[target].append(entry)
             self._touch()
-        self.save_state()
+            compact = self._record("memory", target=target, entry=entry)
+            if target == "long_term_memory":
+                self._long_term_dirty = True
+        if compact:
+            self._saver.mark_dirty()
         self.add_memory_chroma(text, memory_type)
 
-    def add_memory_chroma(self, text, memory_type="short", metadata=None):
-        collection = self.short_mem_collection if memory_type == "short" else self.long_mem_collection
-        doc_id = f"{memory_type}_{int(time.time()*1000)}"
-        meta = metadata or {"timestamp": time.time()}
-        meta["tags"] = advanced_autotag(text)
+    @staticmethod
+    def memory_doc_id(text, memory_type="short"):
+        """
+        Content-addressed ChromaDB ID: the same text always maps to the same document.
+        """
+        return f"{memory_type}_{content_hash(text)[:24]}"
+
+    def advanced_autotag(self, text, is_secret=False):
+        """
+        Lexicon + TF-IDF tags for `text` (see brain/core/nlp_utils.py). Cached by text hash.
+        """
+        return self.tagger.tag(text, is_secret=is_secret)
+
+    def advanced_autotag_batch(self, texts, is_secret=False):
+        return self.tagger.tag_batch(texts, is_secret=is_secret)
+
+    def add_memory_chroma(self, text, memory_type="short", metadata=None, replace=False,
+                          use_advanced_tagging=True, is_secret=False, doc_id=None):
+        """
+        Queue a memory for ChromaDB under its content-addressed ID. Text that is already
+        stored (or queued) is skipped unless `replace` is set, in which case it is upserted.
+        Documents are written in batches by the ingest queue; this blocks only when the
+        queue is full. Returns the document ID.
+
+        With `use_advanced_tagging=False` the caller's metadata["tags"] is kept as is.
+        A fixed `doc_id` (with `replace`) keeps one document that is rewritten in place.
+        """
+        memory_type = "short" if memory_type == "short" else "long"
+        doc_id = doc_id or self.memory_doc_id(text, memory_type)
+        if not replace and self.ingest.contains(memory_type, doc_id):
+            return doc_id
+        meta = dict(metadata) if metadata else {"timestamp": time.time()}
+        meta["seq"] = next(self._doc_seq)
+        if use_advanced_tagging:
+            meta["tags"] = self.tagger.tag(text, is_secret=is_secret)
+        else:
+            meta.setdefault("tags", [])
         for k, v in meta.items():
             if isinstance(v, list):
                 meta[k] = ','.join(map(str, v))
-        collection.add(documents=[text], metadatas=[meta], ids=[doc_id])
+        self.ingest.put(memory_type, doc_id, text, meta, replace=replace)
+        return doc_id
+
+    def add_memories_chroma(self, items, memory_type="short"):
+        """
+        Queue many memories at once. `items` is an iterable of (text, metadata) pairs.
+        Items are tagged in batches of the ingest batch size.
+        """
+        count = 0
+        chunk = []
+        for item in itertools.chain(items, [None]):
+            if item is not None and item[0]:
+                chunk.append(item)
+            if chunk and (item is None or len(chunk) >= self.ingest.batch_size):
+                tags = self.tagger.tag_batch([text for text, _ in chunk])
+                for (text, metadata), text_tags in zip(chunk, tags):
+                    metadata = dict(metadata) if metadata else {"timestamp": time.time()}
+                    metadata["tags"] = text_tags
+                    self.add_memory_chroma(text, memory_type=memory_type, metadata=metadata,
+                                           use_advanced_tagging=False)
+                count += len(chunk)
+                chunk = []
+        return count
+
+    def search_memories_chroma(self, query, memory_type="short", n=5, tags=None):
+        """
+        Most relevant memories for `query` as (document, metadata) pairs, fusing vector
+        similarity with recency. `tags` restricts results to memories carrying all of them.
+        """
+        memory_type = "short" if memory_type == "short" else "long"
+        key = self.query_cache.make_key(memory_type, query, n, tags)
+        results = self.query_cache.get(key)
+        if results is None:
+            results = self.retriever.search(query, memory_type, n=n, tags=tags)
+            self.query_cache.put(key, results)
+        return list(results)
+
+    def get_recent_memories_chroma(self, memory_type="short", n=5, tags=None):
+        """
+        Newest memories in the collection as (document, metadata) pairs, newest first.
+        """
+        memory_type = "short" if memory_type == "short" else "long"
+        return self.retriever.recent(memory_type, n=n, tags=tags)
 
     def get_memories(self, memory_type="short"):
         with self.lock:
@@ -90,18 +227,22 @@ class StateManager:
             return list(self.state.get(target, []))
 
     def set_mode(self, mode):
+        compact = False
         with self.lock:
             if mode in self.modes:
                 old_mode = self.state.get("mode", "idle")
                 self.state["mode"] = mode
                 self._touch()
+                compact = self._record("mode", mode=mode)
                 print(f"[⚙️] Mode: {old_mode} → {mode}")
-                self.save_state()
             else:
                 print(f"[⚠️] Invalid mode: {mode}")
+        if compact:
+            self._saver.mark_dirty()
 
     def set_scene(self, scene_name):
         scene_path = os.path.join("scenes", f"{scene_name}.json")
+        compact = False
         with self.lock:
             try:
                 with open(scene_path, "r") as f:
@@ -109,10 +250,12 @@ class StateManager:
                 self.state["scene"] = scene_name
                 self.state["scene_data"] = scene_data
                 self._touch()
+                compact = self._record("scene", scene=scene_name, scene_data=scene_data)
                 print(f"[🎬] Scene set: {scene_name}")
-                self.save_state()
             except Exception as e:
                 print(f"[⚠️] Scene error: {e}")
+        if compact:
+            self._saver.mark_dirty()
 
     def _touch(self):
         self.state["last_updated"] = time.time()
@@ -137,21 +280,89 @@ class StateManager:
         t.start()
         print(f"[🧠] Memory migration thread live.")
 
+    def _migrate_entries(self, entries, memory_type, key_prefix, metadata_fn):
+        """
+        Queue only entries the migration ledger hasn't seen with the same text.
+        When an entry's text was edited, its old document is dropped unless another
+        migrated entry still has the same content.
+
+        The ingest queue is flushed before anything is recorded, and an entry is recorded
+        only if its document made it into ChromaDB, so a crash or failed write leaves it
+        due for the next pass. Returns (migrated, complete); complete is False if any
+        document could not be written.
+        """
+        migrated = 0
+        queued = []
+        for index, mem in enumerate(entries):
+            text = mem.get("text") if isinstance(mem, dict) else None
+            if not text:
+                continue
+            key = f"{key_prefix}:{mem.get('id') or mem.get('timestamp') or index}"
+            if not self.migration_ledger.needs_migration(key, text):
+                continue
+            old_doc_id = self.migration_ledger.previous_doc_id(key)
+            doc_id = self.add_memory_chroma(text, memory_type=memory_type, metadata=metadata_fn(mem))
+            queued.append((key, text, doc_id, old_doc_id))
+        if not queued:
+            return 0, True
+        complete = self.ingest.flush()
+        stale_ids = set()
+        for key, text, doc_id, old_doc_id in queued:
+            if not self.ingest.contains(memory_type, doc_id):
+                complete = False  # Dead-lettered by the ingest queue; retried next pass
+                continue
+            self.migration_ledger.record(key, text, doc_id)
+            if old_doc_id and old_doc_id != doc_id:
+                stale_ids.add(old_doc_id)
+            migrated += 1
+        if stale_ids:
+            stale_ids -= self.migration_ledger.referenced_doc_ids()
+            if stale_ids:
+                self.ingest.delete(memory_type, stale_ids)
+        return migrated, complete
+
     def migrate_legacy_to_chroma(self, path="memory/state.json"):
+        if not self.migration_ledger.source_changed(path):
+            return
         try:
             with open(path, "r", encoding="utf-8") as f:
                 old_memories = json.load(f)
         except Exception as e:
             print(f"[⚠️] Migration failed: {e}")
             return
-        for mem in old_memories:
-            text = mem.get("text", "")
-            if text:
-                self.add_memory_chroma(text, metadata={"timestamp": mem.get("timestamp", time.time()), "migrated": True})
-        print(f"[🔄] Legacy memories migrated.")
+        if isinstance(old_memories, dict):
+            # A StateManager snapshot rather than a bare memory list: each list keeps its own collection.
+            sources = [("short", f"legacy:{path}", old_memories.get("short_term_memory", [])),
+                       ("long", f"legacy-long:{path}", old_memories.get("long_term_memory", []))]
+        else:
+            sources = [("short", f"legacy:{path}", old_memories)]
+        count = 0
+        complete = True
+        for memory_type, key_prefix, entries in sources:
+            migrated, done = self._migrate_entries(
+                entries, memory_type, key_prefix,
+                lambda mem: {"timestamp": mem.get("timestamp", time.time()), "migrated": True},
+            )
+            count += migrated
+            complete = complete and done
+        if complete:
+            self.migration_ledger.mark_source(path)
+        self.migration_ledger.save()
+        print(f"[🔄] Legacy memories migrated ({count} new or edited).")
+
+    def flush(self):
+        """
+        Write any pending snapshot immediately. Call on shutdown.
+        """
+        self._saver.flush()
 
     def stop(self):
         self.running = False
+        self.ingest.stop()
+        self._saver.stop()
+        self.save_state()
+        self.journal.close()
+        self.embedding_cache.close()
 
     def get_mood(self):
         """
@@ -176,17 +387,23 @@ class StateManager:
 
     def rewrite_memory(self, memory_id, new_text, memory_type="short"):
         """
-        Rewrite a memory entry by ID in the state and save to disk.
+        Rewrite a memory entry by ID in the state and journal the edit.
         """
         with self.lock:
             target = "short_term_memory" if memory_type == "short" else "long_term_memory"
+            edited_timestamp = time.time()
             for mem in self.state.get(target, []):
                 if mem.get("id") == memory_id:
                     mem["text"] = new_text
-                    mem["edited_timestamp"] = time.time()
+                    mem["edited_timestamp"] = edited_timestamp
                     break
             self._touch()
-        self.save_state()
+            compact = self._record("rewrite", target=target, id=memory_id, text=new_text,
+                                   edited_timestamp=edited_timestamp)
+            if target == "long_term_memory":
+                self._long_term_dirty = True
+        if compact:
+            self._saver.mark_dirty()
 
     def mark_context_stale(self):
         with self.lock:
@@ -201,11 +418,20 @@ class StateManager:
             return self.state.get("context_stale", False)
 
     def migrate_long_term_memories_to_chroma(self):
-        # Example: migrate all long-term memories to ChromaDB
+        # Called every idle pulse: skip outright unless long-term memory changed since last pass.
+        # Snapshot under the lock, enqueue outside it: the ingest queue may block for back-pressure.
         with self.lock:
-            for mem in self.state.get("long_term_memory", []):
-                self.add_memory_chroma(mem["text"], memory_type="long", metadata=mem)
-        print("[StateManager] Migrated long-term memories to ChromaDB.")
+            if not self._long_term_dirty:
+                return
+            self._long_term_dirty = False
+            memories = list(self.state.get("long_term_memory", []))
+        count, complete = self._migrate_entries(memories, "long", "long", dict)
+        if not complete:
+            with self.lock:
+                self._long_term_dirty = True  # Try the unwritten ones again next pulse
+        self.migration_ledger.save()
+        if count:
+            print(f"[StateManager] Migrated {count} long-term memories to ChromaDB.")
 
     def rebuild_prompt_context(self):
         # Placeholder for context rebuild logic
@@ -0,0 +1,108 @@
+import threading
+from collections import deque
+
+
+class TaskPool:
+    """
+    Fixed set of worker threads serving one bounded queue per task type.
+
+    Workers take from the task-type queues round-robin, so a flood of one type can't
+    starve the others. `submit()` blocks while that type's queue is full (back-pressure),
+    or returns False at once with `block=False` for work that is safe to drop.
+    `stop()` refuses new work, drains what is queued and joins the workers.
+    """
+
+    def __init__(self, workers=4, queue_limits=None, default_limit=256, name="TaskPool"):
+        self.name = name
+        self.queue_limits = dict(queue_limits or {})
+        self.default_limit = default_limit
+        self._queues = {}
+        self._order = []
+        self._next = 0
+        self._stats = {}
+        self._cond = threading.Condition()
+        self._accepting = True
+        self._running = True
+        self._workers = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _queue(self, task_type):
+        # Caller holds self._cond.
+        if task_type not in self._queues:
+            self._queues[task_type] = deque()
+            self._order.append(task_type)
+            self._stats[task_type] = {
+                "submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "max_depth": 0,
+            }
+        return self._queues[task_type]
+
+    def submit(self, task_type, fn, *args, block=True, timeout=None, **kwargs):
+        """Queue fn(*args, **kwargs). Returns False if the task was rejected."""
+        limit = self.queue_limits.get(task_type, self.default_limit)
+        with self._cond:
+            queue = self._queue(task_type)
+            stats = self._stats[task_type]
+            if self._accepting and len(queue) >= limit and block:
+                self._cond.wait_for(lambda: not self._accepting or len(queue) < limit, timeout)
+            if not self._accepting or len(queue) >= limit:
+                stats["rejected"] += 1
+                return False
+            queue.append((fn, args, kwargs))
+            stats["submitted"] += 1
+            stats["max_depth"] = max(stats["max_depth"], len(queue))
+            self._cond.notify_all()
+            return True
+
+    def _take(self):
+        # Caller holds self._cond. Round-robin over task types.
+        for _ in range(len(self._order)):
+            task_type = self._order[self._next % len(self._order)]
+            self._next += 1
+            queue = self._queues[task_type]
+            if queue:
+                return task_type, queue.popleft()
+        return None, None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                task_type, task = self._take()
+                while task is None:
+                    if not self._running:
+                        return
+                    self._cond.wait()
+                    task_type, task = self._take()
+                self._cond.notify_all()  # wake producers blocked on a full queue
+            fn, args, kwargs = task
+            try:
+                fn(*args, **kwargs)
+                outcome = "completed"
+            except Exception as e:
+                print(f"[{self.name}] {task_type} task failed: {e}")
+                outcome = "failed"
+            with self._cond:
+                self._stats[task_type][outcome] += 1
+                self._cond.notify_all()
+
+    def metrics(self):
+        """Per task type: current queue depth plus submitted/completed/failed/rejected counts."""
+        with self._cond:
+            return {
+                task_type: dict(self._stats[task_type], depth=len(queue))
+                for task_type, queue in self._queues.items()
+            }
+
+    def stop(self, drain=True, timeout=None):
+        with self._cond:
+            self._accepting = False
+            if not drain:
+                for queue in self._queues.values():
+                    queue.clear()
+            self._cond.wait_for(lambda: not any(self._queues.values()), timeout)
+            self._running = False
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
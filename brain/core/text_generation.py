@@ -1,31 +1,176 @@
 import threading
-from llama_cpp import Llama
+from brain.core.model_registry import get_model_registry
+from brain.core.prefix_cache import PrefixStateCache
+
+DEFAULT_MODEL_PATH = "C:\\Users\\cnorthington\\xxJudy\\models\\mythomax-l2-13b.Q5_0.gguf"
+
+class GenerationStream:
+    """
+    Handle for a streaming generation running in a background thread.
+    `text` accumulates as tokens arrive; `cancel()` stops decoding after the current token.
+    """
+    def __init__(self):
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.text = ""
+        self.cancelled = False
+        self.error = None
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def join(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+        return self.text
 
 class TextGeneration:
-    def __init__(self, model_path=None, model_name="mythomax-l2-13b.Q5_0.gguf"):
-        self.model_path = model_path or "C:\\Users\\cnorthington\\xxJudy\\models\\mythomax-l2-13b.Q5_0.gguf"
-        print(f"[TextGeneration] Loading model from {self.model_path} with GPU acceleration if available...")
-        # Try to use GPU layers if supported by llama-cpp-python
+    """
+    Generation front-end over a model from the process-wide ModelRegistry.
+    Construction is cheap: weights load on first use (or via warm()), and every
+    TextGeneration for the same path shares the one loaded copy.
+    """
+    def __init__(self, model_path=None, model_name="mythomax-l2-13b.Q5_0.gguf", model=None, n_gpu_layers=20,
+                 prefix_cache=None, n_ctx=4096):
+        self.model_path = model_path or DEFAULT_MODEL_PATH
+        self.n_gpu_layers = n_gpu_layers  # Adjust as appropriate for your GPU
+        self.n_ctx = n_ctx  # Context window in tokens, prompt + reply
+        self.lock = threading.Lock()  # Guards model switches; decoding locks the shared model entry
+        self.registry = get_model_registry()
+        self.prefix_cache = prefix_cache or PrefixStateCache()
+        if model is not None:
+            # Injected backend (e.g. brain.core.fake_backend.FakeLlama) — no weights loaded.
+            self._entry = self.registry.register(self.model_path, model)
+        else:
+            self._entry = self.registry.acquire(self.model_path)
+
+    def _load_kwargs(self):
+        return {"n_gpu_layers": self.n_gpu_layers, "n_ctx": self.n_ctx}
+
+    @property
+    def model(self):
+        return self.registry.get(self._entry, **self._load_kwargs())
+
+    def warm(self):
+        """Start loading the model in the background so the first reply doesn't pay for it."""
+        return self.registry.warm(self._entry, **self._load_kwargs())
+
+    def is_loaded(self):
+        return self._entry.model is not None
+
+    def count_tokens(self, text):
+        """
+        Prompt tokens `text` will take. Uses the model's tokenizer (no decoding, so no
+        model lock). Until the model has loaded, and for backends without a tokenizer,
+        it returns a ~4 characters per token estimate instead, so counting never waits
+        on a load in progress.
+        """
+        model = self._entry.model
+        tokenize = getattr(model, "tokenize", None) if model is not None else None
+        if tokenize is None:
+            return max(1, len(text) // 4) if text else 0
+        return len(tokenize(text.encode("utf-8"), add_bos=False))
+
+    def close(self):
+        self.registry.release(self.model_path)
+
+    def _prime_prefix(self, model, prefix):
+        """
+        Make sure the model's KV cache starts with `prefix` before a prompt that begins
+        with it. llama.cpp then reuses the longest matching token prefix and only
+        evaluates what follows — the per-turn part, plus nothing at all for an unchanged
+        conversation head. If another prompt (e.g. background work) has overwritten the
+        cache since, the saved prefix state is restored instead of re-evaluated.
+        Backends without state save/load skip this. Caller holds the model's lock.
+        """
+        if not prefix or not hasattr(model, "save_state"):
+            return
         try:
-            self.model = Llama(model_path=self.model_path, n_gpu_layers=20)  # Adjust n_gpu_layers as appropriate for your GPU
-        except TypeError:
-            # Fallback for older llama-cpp-python versions
-            self.model = Llama(model_path=self.model_path)
-        self.lock = threading.Lock()
-
-    def generate(self, prompt, max_tokens=2500, temperature=0.7):
-        with self.lock:
-            response = self.model(
+            tokens = model.tokenize(prefix.encode("utf-8"))
+            # input_ids may be the whole n_ctx buffer; only its first n_tokens were evaluated.
+            n_tokens = getattr(model, "n_tokens", 0)
+            if n_tokens >= len(tokens) and list(model.input_ids[:len(tokens)]) == tokens:
+                return
+            key = self.prefix_cache.key(self.model_path, prefix)
+            state = self.prefix_cache.get(key)
+            if state is not None:
+                model.load_state(state)
+                return
+            model.reset()
+            model.eval(tokens)
+            self.prefix_cache.put(key, model.save_state())
+        except Exception as e:
+            print(f"[TextGeneration] Prefix cache unavailable: {e}")
+
+    def generate(self, prompt, max_tokens=2500, temperature=0.7, prefix=None):
+        """`prefix`: optional static head of `prompt` whose KV state is cached across calls."""
+        entry = self._entry
+        with entry.lock:
+            model = self.registry.get(entry, **self._load_kwargs())
+            self._prime_prefix(model, prefix)
+            response = model(
                 prompt=prompt,
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             return response['choices'][0]['text']
 
-    def generate_async(self, prompt, callback, max_tokens=2500, temperature=0.7):
+    def stream(self, prompt, max_tokens=2500, temperature=0.7, cancel_event=None, prefix=None):
+        """
+        Yield text pieces as the model produces them (llama.cpp stream mode).
+        Stops early when `cancel_event` is set or the consumer closes the generator;
+        the model's lock is held until then.
+        """
+        entry = self._entry
+        with entry.lock:
+            model = self.registry.get(entry, **self._load_kwargs())
+            self._prime_prefix(model, prefix)
+            chunks = model(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            try:
+                for chunk in chunks:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    text = chunk['choices'][0]['text']
+                    if text:
+                        yield text
+            finally:
+                close = getattr(chunks, "close", None)
+                if close:
+                    close()
+
+    def generate_stream(self, prompt, on_token, on_done=None, max_tokens=2500, temperature=0.7, prefix=None):
+        """
+        Stream in a background thread: on_token(piece) per piece, then on_done(full_text, cancelled).
+        Returns a GenerationStream handle that can cancel the generation.
+        """
+        handle = GenerationStream()
+
         def worker():
             try:
-                result = self.generate(prompt, max_tokens=max_tokens, temperature=temperature)
+                for piece in self.stream(prompt, max_tokens=max_tokens, temperature=temperature,
+                                         cancel_event=handle.cancel_event, prefix=prefix):
+                    handle.text += piece
+                    on_token(piece)
+            except Exception as e:
+                handle.error = e
+                print(f"[TextGeneration] Streaming failed: {e}")
+            handle.cancelled = handle.cancel_event.is_set()
+            if on_done:
+                on_done(handle.text, handle.cancelled)
+
+        handle.thread = threading.Thread(target=worker, daemon=True)
+        handle.thread.start()
+        return handle
+
+    def generate_async(self, prompt, callback, max_tokens=2500, temperature=0.7, prefix=None):
+        def worker():
+            try:
+                result = self.generate(prompt, max_tokens=max_tokens, temperature=temperature, prefix=prefix)
             except Exception as e:
                 result = f"Error during generation: {str(e)}"
             callback(result)
@@ -34,16 +179,29 @@ class TextGeneration:
         thread.start()
         return thread
 
-    def switch_model(self, model_path, n_gpu_layers=20):
+    def switch_model(self, model_path, n_gpu_layers=20, wait=False):
         """
-        Switch to a new Llama model at runtime.
+        Switch to a new Llama model at runtime. The new model is loaded in the background
+        while the current one keeps serving, then swapped in between generations.
+        Returns the warm-up thread (joined first if `wait`).
         """
-        with self.lock:
-            try:
-                print(f"[TextGeneration] Switching to model: {model_path}")
-                from llama_cpp import Llama
-                self.model = Llama(model_path=model_path, n_gpu_layers=n_gpu_layers)
+        print(f"[TextGeneration] Switching to model: {model_path}")
+        new_entry = self.registry.acquire(model_path)
+
+        def swap(model):
+            if model is None:
+                self.registry.release(model_path)
+                print(f"[TextGeneration] Failed to switch model: {model_path}")
+                return
+            with self.lock:
+                old_path = self.model_path
+                self._entry = new_entry
                 self.model_path = model_path
-                print(f"[TextGeneration] Model switched successfully.")
-            except Exception as e:
-                print(f"[TextGeneration] Failed to switch model: {e}")
\ No newline at end of file
+                self.n_gpu_layers = n_gpu_layers
+            self.registry.release(old_path)
+            print(f"[TextGeneration] Model switched successfully.")
+
+        thread = self.registry.warm(new_entry, on_ready=swap, n_gpu_layers=n_gpu_layers, n_ctx=self.n_ctx)
+        if wait:
+            thread.join()
+        return thread
\ No newline at end of file
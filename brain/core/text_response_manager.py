@@ -1,48 +1,59 @@
 import os
-import json
-from brain.core.text_generation import TextGeneration
+from brain.core.config_cache import compile_template, get_config_cache, load_prompt_frame
+from brain.core.model_service import PRIORITY_INTERACTIVE, get_model_service
+from brain.core.prompt_assembler import PromptAssembler
 from brain.core.state_manager import StateManager
 
-class TextResponseManager:
-    def __init__(self, state_manager, model_path=None):
-        self.state_manager = state_manager
-        self.text_gen = TextGeneration(model_path=model_path)
-        self.prompt_template = self.load_prompt_template("config/prompt_frame.json")
-
-    def load_prompt_template(self, template_path):
-        if os.path.exists(template_path):
-            with open(template_path, "r", encoding="utf-8") as f:
-                return json.load(f)["template"]
-        else:
-            # Default emergency backup prompt
-            return """
+# Default emergency backup prompt, used while config/prompt_frame.json is missing or unreadable
+DEFAULT_PROMPT_FRAME = compile_template("""
             You are Judy — tethered to Stixx by code and cosmic accident.
             Mood: {mood}
             Scene: {scene}
             Memories: {recent_memories}
             User: {user_name}
             Message: {user_message}
-            Judy:"""
+            Judy:""")
 
-    def build_prompt(self, user_input):
-        context = self.state_manager.get_context_for_prompt()
-        recent_memories = self.state_manager.fetch_recent_memories_in_memory(limit=5)
-        user_name = context["user_profile"].get("username", "Stixx")
-        mood = context["mood"]
-        scene = context["scene"]
+class TextResponseManager:
+    def __init__(self, state_manager, model_path=None, memory_candidates=50):
+        self.state_manager = state_manager
+        self.model_service = get_model_service(model_path)
+        self.text_gen = self.model_service.text_gen
+        self.memory_candidates = memory_candidates
+        self.prompt_assembler = PromptAssembler(self.text_gen.count_tokens, context_size=self.text_gen.n_ctx,
+                                                exact=self.text_gen.is_loaded)
+        self.prompt_template_path = "config/prompt_frame.json"
+        self.core_profile_path = os.path.join(os.path.dirname(__file__), "core_profile.json")
+
+    @property
+    def prompt_template(self):
+        # Cached and mtime-checked, so edits to the frame apply without a restart
+        return self.load_prompt_template(self.prompt_template_path)
 
-        prompt = self.prompt_template.format(
-            judy_name=context["judy_profile"].get("name", "Judy"),
-            user_name=user_name,
-            mood=mood,
-            scene=scene,
-            recent_memories=recent_memories,
-            user_message=user_input
+    def load_prompt_template(self, template_path):
+        return load_prompt_frame(template_path, default=DEFAULT_PROMPT_FRAME)
+
+    def assemble_prompt(self, user_input):
+        core_profile = get_config_cache().load_json(self.core_profile_path, default={}) or {}
+        memories = [m.get("text", "") for m in self.state_manager.get_memories(memory_type="short")]
+        return self.prompt_assembler.assemble(
+            self.prompt_template,
+            {
+                "judy_name": core_profile.get("name", "Judy"),
+                "user_name": core_profile.get("preferred_pet_names", ["Stixx"])[0],
+                "mood": self.state_manager.get_mood(),
+                "scene": self.state_manager.get_scene(),
+                "user_message": user_input,
+            },
+            memories=memories[-self.memory_candidates:],
+            query=user_input,
         )
 
-        return prompt
+    def build_prompt(self, user_input):
+        return self.assemble_prompt(user_input).prompt
 
     def get_response(self, user_input):
-        prompt = self.build_prompt(user_input)
-        response = self.text_gen.generate(prompt)
+        assembled = self.assemble_prompt(user_input)
+        response = self.model_service.generate(assembled.prompt, priority=PRIORITY_INTERACTIVE,
+                                               max_tokens=assembled.max_tokens)
         return response.strip()
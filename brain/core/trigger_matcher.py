@@ -0,0 +1,52 @@
+from brain.core.aho_corasick import AhoCorasick
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class TriggerMatcher:
+    """
+    Compiles lore triggers (entries of config/lore_triggers.json) into Aho–Corasick automata.
+
+    Per-trigger options:
+        "case_sensitive": match the raw text instead of the case-folded text (default False)
+        "word_boundary":  only match whole words, so "sad" won't fire on "crusade" (default False)
+    Each text is scanned once per automaton, and at most one automaton needs a
+    case-sensitive pass, regardless of how many triggers there are.
+    """
+
+    def __init__(self, triggers):
+        self.triggers = [t for t in triggers if isinstance(t, dict) and t.get("trigger")]
+        self._folded = AhoCorasick()
+        self._exact = AhoCorasick()
+        self._has_exact = False
+        for index, trigger in enumerate(self.triggers):
+            if trigger.get("case_sensitive"):
+                self._exact.add(trigger["trigger"], index)
+                self._has_exact = True
+            else:
+                self._folded.add(trigger["trigger"].casefold(), index)
+        self._folded.build()
+        self._exact.build()
+
+    def match(self, text):
+        """Triggers found in `text`, each at most once, in trigger-file order."""
+        if not text:
+            return []
+        hits = set()
+        self._collect(self._folded, text.casefold(), hits)
+        if self._has_exact:
+            self._collect(self._exact, text, hits)
+        return [self.triggers[index] for index in sorted(hits)]
+
+    def _collect(self, automaton, text, hits):
+        for start, end, index in automaton.iter_matches(text):
+            if index in hits:
+                continue
+            if self.triggers[index].get("word_boundary"):
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if end < len(text) and _is_word_char(text[end]):
+                    continue
+            hits.add(index)
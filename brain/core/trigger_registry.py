@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from brain.core.trigger_matcher import TriggerMatcher
+
+
+class TriggerRegistry:
+    """
+    Live view of a lore trigger file.
+
+    A watcher thread polls the file's mtime; when it changes, the file is parsed and
+    compiled into a new TriggerMatcher on that thread and swapped in with a single
+    reference assignment, so readers never block or see a half-built matcher. Compiled
+    matchers are cached by file-content hash, so touching the file costs nothing.
+    A file that fails to parse leaves the previous matcher in place.
+
+    Extra per-trigger fields:
+        "priority": higher wins when several triggers want to set the mood or scene (default 0)
+        "cooldown": seconds before the same trigger may fire again (default 0)
+    """
+
+    def __init__(self, trigger_file="config/lore_triggers.json", poll_interval=2.0):
+        self.trigger_file = trigger_file
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self._mtime = None
+        self._checked = False
+        self._digest = None
+        self._matcher = TriggerMatcher([])
+        self._last_fired = {}
+        self._fire_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.reload_if_changed()
+
+    @property
+    def triggers(self):
+        return self._matcher.triggers
+
+    def load(self):
+        try:
+            with open(self.trigger_file, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            print(f"[TriggerRegistry] Trigger file not found: {self.trigger_file}")
+            return []
+        except json.JSONDecodeError:
+            print(f"[TriggerRegistry] Invalid JSON in trigger file: {self.trigger_file}")
+            return None
+
+    def reload_if_changed(self):
+        """Recompile if the file changed since the last check. Returns True if a new matcher was swapped in."""
+        try:
+            mtime = os.stat(self.trigger_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._checked and mtime == self._mtime:
+            return False  # unchanged, including a file that is still missing
+        self._checked = True
+        self._mtime = mtime
+        try:
+            with open(self.trigger_file, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            digest = None
+        if digest == self._digest and digest is not None:
+            return False
+        triggers = self.load()
+        if triggers is None:
+            return False  # keep serving the last good matcher
+        self._matcher = TriggerMatcher(triggers)
+        self._digest = digest
+        self.reloads += 1
+        print(f"[TriggerRegistry] Loaded {len(self._matcher.triggers)} triggers.")
+        return True
+
+    def match(self, text):
+        """
+        Triggers found in `text` that are off cooldown, highest priority first.
+        Matching triggers are marked as fired.
+        """
+        matcher = self._matcher
+        now = time.monotonic()
+        fired = []
+        with self._fire_lock:
+            for trigger in matcher.match(text):
+                # Stable across reloads, and distinct for rules sharing a phrase.
+                key = (trigger["trigger"], trigger.get("mood"), trigger.get("scene"))
+                cooldown = trigger.get("cooldown", 0)
+                last = self._last_fired.get(key)
+                if cooldown and last is not None and now - last < cooldown:
+                    continue
+                self._last_fired[key] = now
+                fired.append(trigger)
+        fired.sort(key=lambda t: t.get("priority", 0), reverse=True)
+        return fired
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                print(f"[TriggerRegistry] Reload failed: {e}")
@@ -1,6 +1,11 @@
 import threading
-from queue import Queue
+from queue import Queue, Empty
 import time
+from brain.core.task_pool import TaskPool
+from brain.core.single_flight import SingleFlightRefresher
+from brain.core.priority_lanes import LanedQueue
+from brain.core.message_classifier import MessageClassifier
+from brain.core.config_cache import get_config_cache
 
 class MessageHandlerDaemon:
     """
@@ -9,32 +14,71 @@ class MessageHandlerDaemon:
 
     All memory storage, tagging, and prompt/context updates are performed strictly in background threads.
     This ensures that chat responses are never delayed by memory or prompt operations.
+    Background work runs on a shared, bounded TaskPool rather than a new thread per call.
+
+    Incoming messages are classified as they arrive and placed in per-intent lanes, so a
+    flood of notes can't delay a command: lanes are served by weight, with starvation
+    protection for the low-priority ones.
     DO NOT add any blocking or synchronous calls in the main message loop that could add latency to answers.
     """
 
-    def __init__(self, command_router, message_queue: Queue, state_manager=None):
+    def __init__(self, command_router, message_queue: Queue, state_manager=None, max_workers=4, queue_limits=None,
+                 prompt_refresh_debounce=0.25, lane_weights=None, lane_max_wait=2.0, store_timeout=0.05,
+                 store_retry_delay=0.25):
         """
         Args:
             command_router: callable that accepts classified commands for execution.
             message_queue: thread-safe queue with incoming text messages.
             state_manager: (optional) StateManager instance for semantic memory storage and relevancy updates.
+            max_workers: number of background worker threads.
+            queue_limits: (optional) {task_type: max queued tasks}; task types are
+                "note", "secret", "prompt", "prompt_file" and "rewrite".
+            prompt_refresh_debounce: seconds to gather rapid messages into one background prompt refresh.
+            lane_weights: (optional) {intent: weight} for the message lanes; defaults to
+                {"command": 8, "secret": 2, "note": 1}. Intents without a lane go to "note".
+            lane_max_wait: seconds after which a waiting message is served regardless of weight.
+            store_timeout: seconds to wait for room in a full note/secret queue; if none frees up
+                the message goes back to the head of its lane, keeping its place and wait time.
+            store_retry_delay: seconds that lane is then paused before the message is retried.
         """
         self.command_router = command_router
         self.message_queue = message_queue
         self.state_manager = state_manager
+        self.store_timeout = store_timeout
+        self.store_retry_delay = store_retry_delay
         self._running = False
+        self.pool = TaskPool(workers=max_workers, queue_limits=queue_limits or {"prompt": 8},
+                             name="MessageHandlerPool")
+        self.prompt_refresher = SingleFlightRefresher(
+            self.update_background_prompt,
+            debounce=prompt_refresh_debounce,
+            submit=lambda run: self.pool.submit("prompt", run, block=False),
+        )
+        self.classifier = MessageClassifier()
+        self.lanes = LanedQueue(lane_weights or {"command": 8, "secret": 2, "note": 1},
+                                max_wait=lane_max_wait, default_lane="note")
+        self.intake_thread = threading.Thread(target=self._intake_loop, daemon=True)
         self.worker_thread = threading.Thread(target=self._process_messages_loop, daemon=True)
 
     def start(self):
         self._running = True
+        self.intake_thread.start()
         self.worker_thread.start()
         print("[MessageHandlerDaemon] Started.")
 
     def stop(self):
         self._running = False
+        self.intake_thread.join()
         self.worker_thread.join()
+        self.pool.stop(drain=True)
         print("[MessageHandlerDaemon] Stopped.")
 
+    def metrics(self):
+        """Queue depth and task counters per background task type, plus message lane depths."""
+        metrics = self.pool.metrics()
+        metrics["lanes"] = self.lanes.depths()
+        return metrics
+
     def build_prompt(self, user_message, n=5):
         """
         Build a dynamic prompt using recent chat, relevant long-term memories, mood, and topic.
@@ -43,9 +87,9 @@ class MessageHandlerDaemon:
         # Get recent chat (short-term)
         recent_context = self.memory_daemon.prepare_prompt_context() if hasattr(self, 'memory_daemon') and self.memory_daemon else ""
         # Use cached or last background prompt for long-term context
-        background_context = getattr(self, '_last_background_prompt', "")
-        # Optionally, trigger a background update for next turn
-        threading.Thread(target=self.update_background_prompt, daemon=True).start()
+        background_context = self._last_background_prompt
+        # Ask for a refresh for next turn; collapses with any refresh already pending
+        self.prompt_refresher.request()
         # Compose the prompt
         prompt = (
             f"Current mood: {getattr(self, '_last_mood', 'neutral')}\n"
@@ -57,6 +101,11 @@ class MessageHandlerDaemon:
         )
         return prompt
 
+    @property
+    def _last_background_prompt(self):
+        # Lock-free read of the refresher's latest published result.
+        return self.prompt_refresher.value
+
     def update_background_prompt(self, context_query=None, n=5, mood=None, topic=None):
         """
         Update the background prompt with the most relevant memories from ChromaDB.
@@ -86,54 +135,78 @@ class MessageHandlerDaemon:
         print(f"[MessageHandlerDaemon] Updated background prompt (mood/topic/context-aware):\n{prompt}")
         return prompt
 
+    def _intake_loop(self, max_batch=64):
+        # Classify on arrival and sort into lanes; processing order is decided by the lanes.
+        # Everything already waiting is classified together in one pass.
+        while self._running:
+            try:
+                batch = [self.message_queue.get(timeout=1)]
+            except Empty:
+                continue
+            while len(batch) < max_batch:
+                try:
+                    batch.append(self.message_queue.get_nowait())
+                except Empty:
+                    break
+            try:
+                results = self.classifier.classify_batch(batch)
+            except Exception as e:
+                print(f"[MessageHandlerDaemon] Failed to classify messages: {e}")
+                results = [None] * len(batch)
+            for message, result in zip(batch, results):
+                self.lanes.put((result, message), lane=result.intent if result else "note")
+
     def _process_messages_loop(self):
         last_mood = None
         last_topic = None
         while self._running:
             try:
-                message = self.message_queue.get(timeout=1)
+                lane, (result, message), enqueued_at = self.lanes.get(timeout=1, include_time=True)
+            except TimeoutError:
+                continue
+            requeued = False
+            try:
                 print(f"[MessageHandlerDaemon] Processing message: {message}")
+                intent, mood, topic = result or ("unknown", None, None)
 
-                intent = self._classify_intent(message)
+                stored = True
                 if intent == "command":
                     self.command_router(message)
                 elif intent == "note":
                     # Store note in background to avoid latency
-                    self._store_note(message)
+                    stored = self._store_note(message)
                 elif intent == "secret":
                     # Store secret in background to avoid latency
-                    self._handle_secret(message)
+                    stored = self._handle_secret(message)
                 else:
                     print(f"[MessageHandlerDaemon] Unknown intent: '{intent}'. Treating as note.")
-                    self._store_note(message)
+                    stored = self._store_note(message)
+                if not stored:
+                    # Storage is backed up: keep the message at the head of its lane and rest the
+                    # lane instead of blocking this loop, so commands in other lanes keep flowing.
+                    self.lanes.put((result, message), lane=lane, front=True, enqueued_at=enqueued_at)
+                    self.lanes.pause(lane, self.store_retry_delay)
+                    requeued = True
+                    continue
 
-                # Detect mood/topic/context changes (simple example)
-                mood = self._detect_mood(message)
-                topic = self._detect_topic(message)
+                # Mood/topic came out of the same classification pass as the intent
                 context_changed = (mood != last_mood) or (topic != last_topic)
                 last_mood, last_topic = mood, topic
+                if mood:
+                    self._last_mood = mood
+                if topic:
+                    self._last_topic = topic
 
-                # Always update background prompt in a background thread to avoid any latency
-                threading.Thread(
-                    target=self.update_background_prompt,
-                    kwargs={"mood": mood, "topic": topic},
-                    daemon=True
-                ).start()
-
-                self.message_queue.task_done()
-            except Exception:
-                pass
+                # Refresh the background prompt off-thread; bursts collapse into one query
+                self.prompt_refresher.request(mood=mood, topic=topic)
+            except Exception as e:
+                print(f"[MessageHandlerDaemon] Error processing message: {e}")
+            finally:
+                if not requeued:
+                    self.message_queue.task_done()
 
     def _classify_intent(self, message):
-        # Simplified example intent classification:
-        message = message.strip().lower()
-        if message.startswith("/"):
-            return "command"
-        if "secret" in message or "encrypt" in message:
-            return "secret"
-        if len(message) > 0:
-            return "note"
-        return "unknown"
+        return self.classifier.classify(message).intent
 
     def _store_note(self, note):
         # Use StateManager's advanced_autotag for tagging (centralized, ML/NLP-powered)
@@ -153,7 +226,7 @@ class MessageHandlerDaemon:
                 print(f"[MessageHandlerDaemon] Stored note in ChromaDB with tags {tags}: {note}")
             else:
                 print(f"[MessageHandlerDaemon] Stored note: {note}")
-        threading.Thread(target=background_tag_and_store, daemon=True).start()
+        return self.pool.submit("note", background_tag_and_store, timeout=self.store_timeout)
 
     def _handle_secret(self, secret_text):
         # Use StateManager's advanced_autotag for secret tagging
@@ -175,31 +248,14 @@ class MessageHandlerDaemon:
                 print(f"[MessageHandlerDaemon] Securely stored secret in ChromaDB with tags {tags}: {secret_text}")
             else:
                 print(f"[MessageHandlerDaemon] Securely stored secret: {secret_text}")
-        threading.Thread(target=background_tag_and_store_secret, daemon=True).start()
+        return self.pool.submit("secret", background_tag_and_store_secret, timeout=self.store_timeout)
 
     def _detect_mood(self, message):
-        # Simple mood detection (expand with NLP/ML as needed)
-        msg = message.lower()
-        if any(word in msg for word in ["happy", "joy", "excited"]):
-            return "happy"
-        if any(word in msg for word in ["sad", "down", "depressed"]):
-            return "sad"
-        if any(word in msg for word in ["angry", "mad", "frustrated"]):
-            return "angry"
-        return None
+        # Keyword lexicons live in brain/core/message_classifier.py
+        return self.classifier.classify(message).mood
 
     def _detect_topic(self, message):
-        # Simple topic detection (expand with NLP/ML as needed)
-        msg = message.lower()
-        if "project" in msg:
-            return "project"
-        if "meeting" in msg:
-            return "meeting"
-        if "reminder" in msg:
-            return "reminder"
-        if "todo" in msg:
-            return "todo"
-        return None
+        return self.classifier.classify(message).topic
 
     def update_prompt_file(self, new_prompt, prompt_path="config/prompt_frame.json"):
         """
@@ -210,10 +266,11 @@ class MessageHandlerDaemon:
                 import json
                 with open(prompt_path, "w", encoding="utf-8") as f:
                     json.dump({"template": new_prompt}, f, indent=2)
+                get_config_cache().invalidate(prompt_path)
                 print(f"[MessageHandlerDaemon] Prompt file updated at {prompt_path}.")
             except Exception as e:
                 print(f"[MessageHandlerDaemon] Failed to update prompt file: {e}")
-        threading.Thread(target=background_update, daemon=True).start()
+        self.pool.submit("prompt_file", background_update)
 
     def rewrite_memory(self, memory_id, new_text, memory_type="short"):
         """
@@ -229,4 +286,4 @@ class MessageHandlerDaemon:
                 print(f"[MessageHandlerDaemon] Memory {memory_id} rewritten.")
             except Exception as e:
                 print(f"[MessageHandlerDaemon] Failed to rewrite memory: {e}")
-        threading.Thread(target=background_rewrite, daemon=True).start()
+        self.pool.submit("rewrite", background_rewrite)
@@ -5,9 +5,10 @@ class PulseCoordinator:
     """
     Judy's pulse generator. Broadcasts mood, mode, scene, memory count, and daemon health to whoever’s listening.
     """
-    def __init__(self, state_manager, memory_daemon, daemons=None, interval=5):
+    def __init__(self, state_manager, memory_daemon, daemons=None, interval=5, summarizer=None):
         self.state_manager = state_manager
         self.memory_daemon = memory_daemon
+        self.summarizer = summarizer  # Optional ConversationSummarizer, folded forward on idle pulses
         self.daemons = daemons or {}  # dict of {name: daemon_instance}
         self.interval = interval
         self._stop_event = threading.Event()
@@ -35,7 +36,7 @@ class PulseCoordinator:
 
     def _handle_idle_behavior(self):
         """
-        Idle cycle routines: decay mood, migrate memories, prune, rebuild context, etc.
+        Idle cycle routines: decay mood, migrate memories, prune, rebuild context, summarize, etc.
         """
         try:
             self.state_manager.decay_mood()
@@ -52,6 +53,11 @@ class PulseCoordinator:
                 self.state_manager.clear_context_stale()
         except Exception as e:
             print(f"[PulseCoordinator] Error in context staleness handling: {e}")
+        try:
+            if self.summarizer is not None:
+                self.summarizer.maybe_summarize()
+        except Exception as e:
+            print(f"[PulseCoordinator] Error in conversation summarizing: {e}")
 
     def _context_stale(self):
         return self.state_manager.is_context_stale()
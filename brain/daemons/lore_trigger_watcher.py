@@ -3,27 +3,64 @@ import threading
 import json
 import os
 from brain.core.state_manager import StateManager
+from brain.core.trigger_registry import TriggerRegistry
+from brain.core.save_scheduler import atomic_write_json
 
 class LoreTriggerWatcher:
-    def __init__(self, state_manager: StateManager, memory_daemon, update_interval=5, trigger_file="config/lore_triggers.json"):
+    """
+    Fires lore triggers for new short-term memories.
+
+    Only memories appended since the last scan are evaluated: the watcher keeps the
+    highest memory seq it has processed in `cursor_file`, so restarts don't re-fire old
+    triggers either. It wakes immediately on the memory daemon's "memory_added" event;
+    `update_interval` is just a fallback poll.
+
+    Triggers come from a TriggerRegistry, so edits to `trigger_file` go live without a restart.
+    """
+    def __init__(self, state_manager: StateManager, memory_daemon, update_interval=5, trigger_file="config/lore_triggers.json",
+                 cursor_file="runtime/lore_cursor.json", reload_interval=2.0):
         self.state_manager = state_manager
         self.memory_daemon = memory_daemon
         self.update_interval = update_interval
         self.trigger_file = trigger_file
+        self.cursor_file = cursor_file
         self._running = False
         self._thread = None
-        self.triggers = self.load_triggers()
+        self._wake = threading.Event()
+        self.registry = TriggerRegistry(trigger_file, poll_interval=reload_interval)
+        self.cursor = self.load_cursor()
+        last_seq = getattr(memory_daemon, "last_seq", None)
+        if last_seq is not None and self.cursor > last_seq:
+            # Memory seqs restarted (e.g. memory file replaced); a cursor ahead of them would skip everything new.
+            print(f"[LoreTriggerWatcher] Cursor {self.cursor} is ahead of memory seq {last_seq}; resetting.")
+            self.cursor = last_seq
+            self.save_cursor()
+        if hasattr(memory_daemon, "register_observer"):
+            memory_daemon.register_observer(self._on_memory_event)
 
-    def load_triggers(self):
+    def load_cursor(self):
         try:
-            with open(self.trigger_file, "r") as f:
-                return json.load(f)
-        except FileNotFoundError:
-            print(f"[LoreTriggerWatcher] Trigger file not found: {self.trigger_file}")
-            return []
-        except json.JSONDecodeError:
-            print(f"[LoreTriggerWatcher] Invalid JSON in trigger file: {self.trigger_file}")
-            return []
+            with open(self.cursor_file, "r") as f:
+                return int(json.load(f).get("seq", 0))
+        except (FileNotFoundError, json.JSONDecodeError, ValueError, AttributeError):
+            return 0
+
+    def save_cursor(self):
+        try:
+            atomic_write_json(self.cursor_file, {"seq": self.cursor})
+        except Exception as e:
+            print(f"[LoreTriggerWatcher] Failed to save cursor: {e}")
+
+    def _on_memory_event(self, event_type, data=None):
+        if event_type == "memory_added":
+            self._wake.set()
+
+    @property
+    def triggers(self):
+        return self.registry.triggers
+
+    def load_triggers(self):
+        return self.registry.load() or []
 
     def start(self):
         if self._running:
@@ -31,32 +68,52 @@ class LoreTriggerWatcher:
             return
         print("[LoreTriggerWatcher] Starting lore trigger watcher daemon...")
         self._running = True
+        self.registry.start()
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
 
     def stop(self):
         print("[LoreTriggerWatcher] Stopping lore trigger watcher daemon...")
         self._running = False
+        self._wake.set()
+        self.registry.stop()
         if self._thread:
             self._thread.join()
 
+    def scan_new_memories(self):
+        """
+        Evaluate memories appended since the cursor, then advance it. Returns how many were scanned.
+        """
+        memories = self.memory_daemon.get_memories(memory_type="short", since_seq=self.cursor)
+        if not memories:
+            return 0
+
+        # Check for triggers in the memories: one automaton pass per memory.
+        # Matches come back highest priority first; that one decides mood and scene.
+        for memory in memories:
+            mood = scene = None
+            for trigger in self.registry.match(memory.get("text") or memory.get("content", "")):
+                print(f"[LoreTriggerWatcher] Triggered by: {trigger['trigger']}")
+                if mood is None and "mood" in trigger:
+                    mood = trigger["mood"]
+                if scene is None and "scene" in trigger:
+                    scene = trigger["scene"]
+            if mood is not None:
+                self.state_manager.update_mood(mood)
+            if scene is not None:
+                self.state_manager.set_scene(scene)
+            self.cursor = max(self.cursor, memory.get("seq", self.cursor))
+        self.save_cursor()
+        return len(memories)
+
     def _run(self):
         while self._running:
-            # Get the latest short-term memories
-            memories = self.memory_daemon.get_memories(memory_type="short")
-
-            # Check for triggers in the memories
-            for memory in memories:
-                text = memory["text"].lower()
-                for trigger in self.triggers:
-                    if trigger["trigger"] in text:
-                        print(f"[LoreTriggerWatcher] Triggered by: {trigger['trigger']}")
-                        if "mood" in trigger:
-                            self.state_manager.update_mood(trigger["mood"])
-                        if "scene" in trigger:
-                            self.state_manager.set_scene(trigger["scene"])
-
-            time.sleep(self.update_interval)
+            self._wake.clear()
+            try:
+                self.scan_new_memories()
+            except Exception as e:
+                print(f"[LoreTriggerWatcher] Scan error: {e}")
+            self._wake.wait(self.update_interval)
 
 if __name__ == "__main__":
     # Example usage (for testing purposes)
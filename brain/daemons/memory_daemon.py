@@ -2,18 +2,27 @@
 
 import os
 import json
+import threading
 from datetime import datetime
 from core.daemons.base_daemon import BaseDaemon
+from brain.core.save_scheduler import SaveScheduler, atomic_write_json
 
 class MemoryDaemon(BaseDaemon):
-    def __init__(self, memory_file, archive_file, expiration_minutes=60):
+    def __init__(self, memory_file, archive_file, expiration_minutes=60, save_latency=2.0):
         super().__init__(name="MemoryDaemon", interval=10)
         self.memory_file = memory_file
+        # Seq high-water mark survives expiration: memory.json alone can't, once old items are archived out
+        self.seq_file = os.path.splitext(memory_file)[0] + "_seq.json"
         self.archive_file = archive_file
         self.expiration_minutes = expiration_minutes
         self.memory = []
         self.state_manager = None  # Optional external reference
+        self.summarizer = None  # Set by ConversationSummarizer; its rolling summary heads the prompt context
+        self._memory_lock = threading.Lock()
+        self._observers = []
+        self._seq = 0
         self.load_memory()
+        self._saver = SaveScheduler(self._write_memory, max_latency=save_latency, name="MemoryDaemon")
 
     def heartbeat(self):
         self.check_memory_expiration()
@@ -33,10 +42,75 @@ class MemoryDaemon(BaseDaemon):
                     self.memory = []
         else:
             self.memory = []
+        # Every memory carries a monotonically increasing seq so readers can resume from a cursor.
+        self._seq = max((item.get("seq", 0) for item in self.memory if isinstance(item, dict)), default=0)
+        self._seq = max(self._seq, self._load_seq_high_water())
+        for item in self.memory:
+            if isinstance(item, dict) and "seq" not in item:
+                self._seq += 1
+                item["seq"] = self._seq
+
+    def _load_seq_high_water(self):
+        try:
+            with open(self.seq_file, 'r') as f:
+                return int(json.load(f).get("seq", 0))
+        except (FileNotFoundError, json.JSONDecodeError, ValueError, AttributeError):
+            return 0
+
+    @property
+    def last_seq(self):
+        """Highest seq ever handed out; cursors above it are stale."""
+        with self._memory_lock:
+            return self._seq
+
+    def register_observer(self, callback):
+        """
+        Subscribe callback(event_type, data); fired with "memory_added" for each new memory
+        and "memories_expired" (a list) when expiration archives some.
+        """
+        self._observers.append(callback)
+
+    def notify_observers(self, event_type, data=None):
+        for cb in self._observers:
+            try:
+                cb(event_type, data)
+            except Exception as e:
+                print(f"[MemoryDaemon] Observer error: {e}")
+
+    def get_memories(self, memory_type="short", since_seq=0):
+        """
+        Memories with seq greater than `since_seq`, oldest first.
+        """
+        with self._memory_lock:
+            start = len(self.memory)
+            while start > 0:
+                item = self.memory[start - 1]
+                if isinstance(item, dict) and item.get("seq", 0) <= since_seq:
+                    break
+                start -= 1
+            return [item for item in self.memory[start:] if isinstance(item, dict)]
 
     def save_memory(self):
-        with open(self.memory_file, 'w') as f:
-            json.dump(self.memory, f, indent=4)
+        """
+        Schedule a write; bursts of changes are coalesced into one atomic write.
+        """
+        self._saver.mark_dirty()
+
+    def _write_memory(self):
+        with self._memory_lock:
+            snapshot = list(self.memory)
+            seq = self._seq
+        atomic_write_json(self.memory_file, snapshot, indent=4)
+        atomic_write_json(self.seq_file, {"seq": seq})
+
+    def flush(self):
+        self._saver.flush()
+
+    def stop(self):
+        # Join the heartbeat first so nothing schedules a save after the saver's final flush.
+        if self.is_alive():
+            super().stop()
+        self._saver.stop()
 
     def archive_memory(self, item):
         if not os.path.exists(self.archive_file):
@@ -57,7 +131,10 @@ class MemoryDaemon(BaseDaemon):
     def check_memory_expiration(self):
         now = datetime.utcnow()
         active_memories = []
-        for item in self.memory:
+        expired_items = []
+        with self._memory_lock:
+            snapshot = list(self.memory)
+        for item in snapshot:
             try:
                 timestamp_str = item.get("timestamp")
                 if not isinstance(timestamp_str, str):
@@ -67,33 +144,53 @@ class MemoryDaemon(BaseDaemon):
 
                 if age > self.expiration_minutes:
                     self.archive_memory(item)
+                    expired_items.append(item)
                 else:
                     active_memories.append(item)
 
             except Exception as e:
                 print(f"[MemoryDaemon] Error processing memory item: {item.get('id', 'Unknown ID')} | Error: {e}")
 
-        if len(self.memory) != len(active_memories):
-            print(f"[MemoryDaemon] Expired {len(self.memory) - len(active_memories)} memories.")
-        self.memory = active_memories
-        self.save_memory()
+        with self._memory_lock:
+            # Keep anything appended while we were scanning.
+            active_memories.extend(self.memory[len(snapshot):])
+            expired = len(self.memory) - len(active_memories)
+            self.memory = active_memories
+        if expired:
+            print(f"[MemoryDaemon] Expired {expired} memories.")
+            self.save_memory()
+        if expired_items:
+            self.notify_observers("memories_expired", expired_items)
 
     def add_memory(self, memory_item, memory_type="short"):
-        self.memory.append(memory_item)
+        with self._memory_lock:
+            if isinstance(memory_item, dict):
+                self._seq += 1
+                memory_item["seq"] = self._seq
+            self.memory.append(memory_item)
         self.save_memory()
+        self.notify_observers("memory_added", memory_item)
 
     def prepare_prompt_context(self):
-        if not self.memory:
+        earlier = self.summarizer.summary if self.summarizer else ""
+        if not self.memory and not earlier:
             return "(No recent memories.)"
-        recent = [item for item in self.memory if isinstance(item, dict)][-5:]
+        if self.summarizer:
+            # Everything the summary doesn't cover yet (at most keep_recent + chunk_size - 1 items),
+            # so no turn falls between the two.
+            recent = self.get_memories(since_seq=self.summarizer.through_seq)
+        else:
+            recent = [item for item in self.memory if isinstance(item, dict)][-5:]
         summary = "\n".join([
             f"[{item.get('timestamp', 'unknown')}] {item.get('content', str(item))}" for item in recent
         ])
+        if earlier:
+            summary = f"[Earlier] {earlier}\n{summary}".rstrip()
         return summary
 
     def on_heartbeat(self):
         print("[MemoryDaemon] Heartbeat received. Syncing to StateManager...")
         if self.state_manager:
-            for item in self.memory:
-                if isinstance(item, dict) and 'content' in item:
-                    self.state_manager.add_memory_chroma(item['content'], memory_type="short", metadata=item)
+            with self._memory_lock:
+                items = [item for item in self.memory if isinstance(item, dict) and 'content' in item]
+            self.state_manager.add_memories_chroma(((item['content'], item) for item in items), memory_type="short")
@@ -3,15 +3,18 @@ import os
 import time
 import json
 import signal
-from queue import Queue
+from queue import Queue, Empty
 from brain.daemons.memory_daemon import MemoryDaemon
 from brain.daemons.lore_trigger_watcher import LoreTriggerWatcher
 from brain.agents.jalen_agent import JalenAgent
 from brain.core.state_manager import StateManager
 from brain.daemons.MessageHandlerDaemon import MessageHandlerDaemon
 from brain.daemons.PulseCoordinator import PulseCoordinator
+from brain.core.conversation_summarizer import ConversationSummarizer
+from brain.core.model_service import get_model_service
 from runners import run_daemons
 from gui.widgets import status_bar  # 👈 so PulseCoordinator can hit the GUI pulse handler
+from gui.components.typing_indicator import TypingIndicator
 import threading
 import tkinter as tk
 from tkinter import scrolledtext
@@ -63,39 +66,89 @@ def remove_pid():
         os.remove(PID_FILE)
 
 def launch_test_gui(agent):
+    """
+    Minimal chat window. Sending never blocks the Tk loop: the reply is generated by
+    the model service in the background and its tokens are handed back through a
+    queue that the Tk thread drains with after(). While the user types, the agent
+    pre-assembles the prompt context so a send only pays for decoding.
+    """
+    events = Queue()  # ("token", piece) / ("done", (text, cancelled)), filled by generation threads
+    current = {"handle": None}
+
+    def append(text):
+        chat_log.config(state='normal')
+        chat_log.insert(tk.END, text)
+        chat_log.config(state='disabled')
+        chat_log.see(tk.END)
+
     def on_send(event=None):
         user_input = input_box.get()
-        if user_input.strip():
-            chat_log.config(state='normal')
-            chat_log.insert(tk.END, f'You: {user_input}\n')
-            chat_log.config(state='disabled')
-            input_box.delete(0, tk.END)
-            # Get response from agent (simulate chat)
-            response = agent.generate_response(user_input) if hasattr(agent, 'generate_response') else "[No response method]"
-            chat_log.config(state='normal')
-            chat_log.insert(tk.END, f'Judy: {response}\n')
-            chat_log.config(state='disabled')
-            chat_log.see(tk.END)
+        if not user_input.strip() or current["handle"] is not None:
+            return
+        append(f'You: {user_input}\n')
+        input_box.delete(0, tk.END)
+        append('Judy: ')
+        typing_indicator.start_typing()
+        send_btn.config(state='disabled')
+        current["handle"] = agent.generate_response_stream(
+            user_input,
+            on_token=lambda piece: events.put(("token", piece)),
+            on_done=lambda text, cancelled: events.put(("done", (text, cancelled))),
+        )
+
+    def on_key_release(event=None):
+        if event is not None and event.keysym == "Return":
+            return
+        agent.on_typing(input_box.get())
+
+    def drain_events():
+        # Runs on the Tk thread; the only place the chat log is touched during generation.
+        try:
+            while True:
+                kind, data = events.get_nowait()
+                if kind == "token":
+                    typing_indicator.stop_typing()
+                    append(data)
+                else:
+                    text, cancelled = data
+                    typing_indicator.stop_typing()
+                    append(' [cut off]\n' if cancelled else '\n')
+                    current["handle"] = None
+                    send_btn.config(state='normal')
+        except Empty:
+            pass
+        root.after(30, drain_events)
+
+    def on_close():
+        if current["handle"] is not None:
+            current["handle"].cancel()
+        root.destroy()
 
     root = tk.Tk()
     root.title("Judy Test Chat")
     root.geometry("400x300")
     root.resizable(False, False)
+    root.protocol("WM_DELETE_WINDOW", on_close)
 
     chat_log = scrolledtext.ScrolledText(root, state='disabled', wrap=tk.WORD, height=15)
     chat_log.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
 
+    typing_indicator = TypingIndicator(root)
+    typing_indicator.pack(anchor=tk.W, padx=10)
+
     input_frame = tk.Frame(root)
     input_frame.pack(fill=tk.X, padx=10, pady=(0,10))
 
     input_box = tk.Entry(input_frame)
     input_box.pack(side=tk.LEFT, fill=tk.X, expand=True)
     input_box.bind('<Return>', on_send)
+    input_box.bind('<KeyRelease>', on_key_release)
 
     send_btn = tk.Button(input_frame, text="Send", command=on_send)
     send_btn.pack(side=tk.RIGHT)
 
     input_box.focus()
+    root.after(30, drain_events)
     root.mainloop()
 
 def main():
@@ -104,10 +157,12 @@ def main():
     print("[✅] Config loaded:", config)
 
     state_file = config.get("state_file", "runtime/state.json")
-    state_manager = StateManager(memory_file=state_file)
+    save_latency = config.get("save_latency_seconds", 2.0)
+    state_manager = StateManager(memory_file=state_file, save_latency=save_latency)
 
     memory_daemon = MemoryDaemon(memory_file=MEMORY_PATH, archive_file=ARCHIVE_PATH,
-                                 expiration_minutes=config.get("memory_settings", {}).get("expiration_minutes", 60))
+                                 expiration_minutes=config.get("memory_settings", {}).get("expiration_minutes", 60),
+                                 save_latency=save_latency)
     memory_daemon.state_manager = state_manager
 
     lore_trigger_watcher = LoreTriggerWatcher(state_manager, memory_daemon)
@@ -125,17 +180,22 @@ def main():
         "LoreTriggerWatcher": lore_trigger_watcher,
         "MessageHandler": message_handler
     }
+    # Older conversation is folded into a rolling summary on idle pulses
+    summarizer = ConversationSummarizer(memory_daemon, state_manager=state_manager,
+                                        model_service=get_model_service())
     pulse_coordinator = PulseCoordinator(
         state_manager=state_manager,
         memory_daemon=memory_daemon,
         daemons=daemons,
-        interval=5
+        interval=5,
+        summarizer=summarizer
     )
     pulse_coordinator.register_observer(status_bar.handle_pulse_update)
     pulse_coordinator.start()
 
     # Fire up Judy's chat agent
     agent = JalenAgent(memory_daemon, state_manager)
+    agent.text_gen.warm()  # Load weights in the background while the GUI comes up
     # agent.start_chatbox()  # Disabled for test GUI
     gui_thread = threading.Thread(target=launch_test_gui, args=(agent,), daemon=True)
     gui_thread.start()
@@ -152,6 +212,7 @@ def main():
         lore_trigger_watcher.stop()
         message_handler.stop()
         pulse_coordinator.stop()
+        state_manager.stop()
     finally:
         remove_pid()
 
@@ -0,0 +1,127 @@
+import pytest
+
+from brain.core.chroma_ingest import ChromaIngestQueue
+
+
+class StubCollection:
+    """In-memory stand-in for a ChromaDB collection; the next `fail_writes` upserts raise."""
+
+    def __init__(self, fail_writes=0):
+        self.docs = {}
+        self.upserts = []
+        self.fail_writes = fail_writes
+
+    def get(self, include=None):
+        return {"ids": list(self.docs)}
+
+    def upsert(self, documents, metadatas, ids, embeddings=None):
+        if self.fail_writes:
+            self.fail_writes -= 1
+            raise RuntimeError("collection unavailable")
+        self.upserts.append(list(ids))
+        for doc_id, document, meta in zip(ids, documents, metadatas):
+            self.docs[doc_id] = (document, meta)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.docs.pop(doc_id, None)
+
+
+@pytest.fixture
+def make_queue():
+    queues = []
+
+    def make(collection, **kwargs):
+        # A long flush interval keeps the background worker out of the way; tests flush().
+        kwargs.setdefault("flush_interval", 60.0)
+        queue = ChromaIngestQueue({"short": collection}, **kwargs)
+        events = []
+        queue.register_observer(lambda event_type, data: events.append((event_type, data)))
+        queues.append(queue)
+        return queue, events
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def test_flush_writes_in_batches_and_skips_known_ids(make_queue):
+    collection = StubCollection()
+    collection.docs["old"] = ("already stored", {})
+    queue, events = make_queue(collection, batch_size=2)
+
+    assert not queue.put("short", "old", "already stored", {})
+    for i in range(3):
+        assert queue.put("short", f"d{i}", f"text {i}", {})
+    assert queue.flush()
+
+    assert collection.upserts == [["d0", "d1"], ["d2"]]
+    assert [event for event, _ in events] == ["written", "written"]
+    assert queue.pending() == 0
+
+
+def test_replace_updates_a_still_buffered_document_in_place(make_queue):
+    collection = StubCollection()
+    queue, _ = make_queue(collection)
+
+    queue.put("short", "d", "first", {})
+    queue.put("short", "d", "second", {}, replace=True)
+    queue.flush()
+
+    assert collection.upserts == [["d"]]
+    assert collection.docs["d"][0] == "second"
+
+
+def test_failed_batch_is_retried_until_written(make_queue):
+    collection = StubCollection(fail_writes=2)
+    queue, events = make_queue(collection, max_attempts=3)
+
+    queue.put("short", "d", "text", {})
+    assert queue.flush()
+
+    assert "d" in collection.docs
+    assert queue.failed == []
+    assert [(event, data.get("dead")) for event, data in events] == [
+        ("failed", False), ("failed", False), ("written", None),
+    ]
+
+
+def test_batch_that_keeps_failing_is_dead_lettered(make_queue):
+    collection = StubCollection(fail_writes=10)
+    queue, events = make_queue(collection, max_attempts=2)
+
+    queue.put("short", "d", "text", {"k": 1})
+    assert not queue.flush()
+
+    assert queue.failed == [("short", "d", "text", {"k": 1})]
+    assert not queue.contains("short", "d")
+    assert events[-1][0] == "failed" and events[-1][1]["dead"]
+    assert "collection unavailable" in events[-1][1]["error"]
+    assert queue.pending() == 0
+
+
+def test_dead_lettered_document_can_be_queued_again(make_queue):
+    collection = StubCollection(fail_writes=1)
+    queue, _ = make_queue(collection, max_attempts=1)
+
+    queue.put("short", "d", "text", {})
+    assert not queue.flush()
+    assert queue.put("short", "d", "text", {})
+    assert queue.flush()
+    assert "d" in collection.docs
+
+
+def test_delete_drops_buffered_and_stored_documents(make_queue):
+    collection = StubCollection()
+    queue, events = make_queue(collection)
+
+    queue.put("short", "stored", "text", {})
+    queue.flush()
+    queue.put("short", "buffered", "text", {})
+    queue.delete("short", ["stored", "buffered"])
+    queue.flush()
+
+    assert collection.docs == {}
+    assert not queue.contains("short", "buffered")
+    assert events[-1][0] == "deleted"
+    assert set(events[-1][1]["ids"]) == {"stored", "buffered"}
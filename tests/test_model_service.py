@@ -0,0 +1,136 @@
+import threading
+import time
+import uuid
+
+import pytest
+
+from brain.core.fake_backend import FakeLlama
+from brain.core.model_service import (PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, ModelService,
+                                      get_model_service)
+from brain.core.text_generation import DEFAULT_MODEL_PATH, TextGeneration
+
+REPLY = "one two three four five six seven eight"
+
+
+@pytest.fixture
+def make_service():
+    made = []
+
+    def make(token_delay=0.0, reply=REPLY):
+        fake = FakeLlama(reply=reply, token_delay=token_delay)
+        text_gen = TextGeneration(model_path=f"fake-{uuid.uuid4().hex}", model=fake)
+        service = ModelService(text_gen)
+        made.append((service, text_gen))
+        return service, fake
+
+    yield make
+    for service, text_gen in made:
+        service.stop()
+        text_gen.close()
+
+
+def _started(request, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while request.status != "running" and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return request.status == "running"
+
+
+def test_generates_through_the_fake_backend(make_service):
+    service, fake = make_service()
+    assert service.generate("hi", max_tokens=3, timeout=5) == "one two three"
+    assert fake.calls[0]["prompt"] == "hi"
+
+
+def test_interactive_overtakes_queued_background_work(make_service):
+    service, _ = make_service(token_delay=0.01)
+    finished = []
+    blocker = service.submit("blocker", on_token=lambda piece: None,
+                             on_done=lambda text, cancelled: finished.append("blocker"))
+    assert _started(blocker)
+    background = service.submit("bg", priority=PRIORITY_BACKGROUND,
+                                on_done=lambda text, cancelled: finished.append("background"))
+    chat = service.submit("chat", priority=PRIORITY_INTERACTIVE,
+                          on_done=lambda text, cancelled: finished.append("chat"))
+
+    background.wait(5)
+    chat.wait(5)
+    assert finished == ["blocker", "chat", "background"]
+
+
+def test_running_background_request_yields_to_chat_and_restarts(make_service):
+    service, _ = make_service(token_delay=0.02)
+    finished = []
+    background = service.submit("bg", priority=PRIORITY_BACKGROUND,
+                                on_done=lambda text, cancelled: finished.append("background"))
+    assert _started(background)
+    chat = service.submit("chat", priority=PRIORITY_INTERACTIVE,
+                          on_done=lambda text, cancelled: finished.append("chat"))
+
+    assert chat.wait(5) == REPLY
+    assert background.wait(5) == REPLY  # Restarted from scratch, not stitched together
+    assert finished == ["chat", "background"]
+    assert background.preempted == 1
+    assert service.stats()["preemptions"] == 1
+
+
+def test_streaming_background_request_is_not_preempted(make_service):
+    service, _ = make_service(token_delay=0.02)
+    pieces = []
+    background = service.submit("bg", priority=PRIORITY_BACKGROUND, on_token=pieces.append)
+    assert _started(background)
+    chat = service.submit("chat", priority=PRIORITY_INTERACTIVE)
+
+    background.wait(5)
+    chat.wait(5)
+    assert background.preempted == 0
+    assert "".join(pieces) == REPLY
+
+
+def test_request_expires_while_queued(make_service):
+    service, _ = make_service(token_delay=0.02)
+    blocker = service.submit("blocker")
+    assert _started(blocker)
+    late = service.submit("late", timeout=0.01)
+
+    with pytest.raises(TimeoutError):
+        late.wait(5)
+    assert late.status == "expired"
+    assert blocker.wait(5) == REPLY
+
+
+def test_deadline_stops_a_running_generation(make_service):
+    service, _ = make_service(token_delay=0.05)
+    request = service.submit("slow", timeout=0.12)
+
+    with pytest.raises(TimeoutError):
+        request.wait(5)
+    assert request.status == "expired"
+    assert 0 < len(request.text) < len(REPLY)
+
+
+def test_cancel_event_from_the_caller_stops_the_request(make_service):
+    service, _ = make_service(token_delay=0.02)
+    cancel = threading.Event()
+    request = service.submit("chat", cancel_event=cancel)
+    assert _started(request)
+    cancel.set()
+
+    request.join(5)
+    assert request.status == "cancelled"
+    assert request.cancelled
+
+
+def test_deterministic_requests_are_served_from_the_response_cache(make_service):
+    service, fake = make_service()
+    first = service.generate("same prompt", temperature=0.0, cache=True, timeout=5)
+    second = service.generate("same prompt", temperature=0.0, cache=True, timeout=5)
+    sampled = service.generate("same prompt", temperature=0.7, cache=True, timeout=5)
+
+    assert first == second == sampled == REPLY
+    assert len(fake.calls) == 2
+    assert service.response_cache.stats()["hits"] == 1
+
+
+def test_default_model_path_shares_one_service():
+    assert get_model_service() is get_model_service(DEFAULT_MODEL_PATH)
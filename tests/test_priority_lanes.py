@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from brain.core.priority_lanes import LanedQueue
+
+
+def _drain(queue, n):
+    return [queue.get(timeout=1)[0] for _ in range(n)]
+
+
+def test_lanes_are_served_by_weight():
+    queue = LanedQueue({"command": 3, "note": 1}, max_wait=60)
+    for i in range(8):
+        queue.put(f"c{i}", "command")
+        queue.put(f"n{i}", "note")
+
+    served = _drain(queue, 8)
+    assert served.count("command") == 6
+    assert served.count("note") == 2
+
+
+def test_items_keep_fifo_order_within_a_lane():
+    queue = LanedQueue({"command": 1}, max_wait=60)
+    for i in range(3):
+        queue.put(i, "command")
+    assert [queue.get(timeout=1)[1] for _ in range(3)] == [0, 1, 2]
+
+
+def test_unknown_lane_falls_back_to_default():
+    queue = LanedQueue({"command": 8, "note": 1}, default_lane="note")
+    queue.put("x", "gibberish")
+    assert queue.get(timeout=1) == ("note", "x")
+
+
+def test_starved_item_is_served_next_regardless_of_weight():
+    queue = LanedQueue({"command": 100, "note": 1}, max_wait=0.05)
+    queue.put("old note", "note")
+    time.sleep(0.1)
+    for i in range(5):
+        queue.put(f"c{i}", "command")
+    assert queue.get(timeout=1) == ("note", "old note")
+
+
+def test_paused_lane_is_skipped_until_the_pause_ends():
+    queue = LanedQueue({"command": 1, "note": 100}, max_wait=60)
+    queue.put("note", "note")
+    queue.pause("note", 0.2)
+    for i in range(3):
+        queue.put(f"c{i}", "command")
+
+    assert _drain(queue, 3) == ["command"] * 3
+    started = time.monotonic()
+    assert queue.get(timeout=1) == ("note", "note")
+    assert 0.1 < time.monotonic() - started < 0.5
+
+
+def test_requeued_item_keeps_its_wait_toward_starvation():
+    queue = LanedQueue({"command": 100, "note": 1}, max_wait=0.2)
+    queue.put("note", "note")
+    time.sleep(0.15)
+    lane, item, enqueued_at = queue.get(timeout=1, include_time=True)
+    queue.put(item, lane, front=True, enqueued_at=enqueued_at)
+    queue.pause(lane, 0.1)
+    time.sleep(0.15)
+    for i in range(5):
+        queue.put(f"c{i}", "command")
+
+    # Waited 0.3s in total, past max_wait, though only 0.15s since it was put back.
+    assert queue.get(timeout=1) == ("note", "note")
+
+
+def test_get_times_out_when_nothing_is_ready():
+    queue = LanedQueue({"note": 1})
+    with pytest.raises(TimeoutError):
+        queue.get(timeout=0.05)
+    queue.put("x", "note")
+    queue.pause("note", 5)
+    with pytest.raises(TimeoutError):
+        queue.get(timeout=0.05)
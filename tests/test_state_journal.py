@@ -0,0 +1,92 @@
+import json
+
+from brain.core.state_journal import StateJournal
+
+
+def _default_state():
+    # load() copies the default shallowly and replays into its lists, so each load gets fresh ones.
+    return {"mood": "neutral", "short_term_memory": []}
+
+
+def _memory(journal, text):
+    return journal.append("memory", target="short_term_memory", entry={"text": text})
+
+
+def test_replays_journal_on_top_of_snapshot(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    state = _default_state()
+    _memory(journal, "before snapshot")
+    state["short_term_memory"].append({"text": "before snapshot"})
+    journal.compact(state)
+    _memory(journal, "after snapshot")
+    journal.append("mood", mood="happy")
+    journal.close()
+
+    state, replayed = StateJournal(path).load(_default_state())
+    assert replayed == 2
+    assert state["mood"] == "happy"
+    assert [m["text"] for m in state["short_term_memory"]] == ["before snapshot", "after snapshot"]
+
+
+def test_records_in_snapshot_are_not_replayed_twice(tmp_path):
+    # Crash between writing the snapshot and truncating the journal.
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    for text in ("a", "b", "c"):
+        _memory(journal, text)
+    journal.close()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"mood": "neutral", "short_term_memory": [{"text": t} for t in "abc"],
+                   StateJournal.SEQ_KEY: 3}, f)
+
+    state, replayed = StateJournal(path).load(_default_state())
+    assert replayed == 0
+    assert [m["text"] for m in state["short_term_memory"]] == ["a", "b", "c"]
+
+
+def test_torn_tail_is_truncated_and_next_append_survives(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    _memory(journal, "whole")
+    journal.close()
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"seq":2,"op":"memory","target":"short_term_memory","ent')
+
+    journal = StateJournal(path)
+    state, replayed = journal.load(_default_state())
+    assert replayed == 1
+    _memory(journal, "after crash")
+    journal.close()
+
+    state, replayed = StateJournal(path).load(_default_state())
+    assert replayed == 2
+    assert [m["text"] for m in state["short_term_memory"]] == ["whole", "after crash"]
+
+
+def test_append_never_continues_an_unterminated_line(tmp_path):
+    path = str(tmp_path / "state.json")
+    journal = StateJournal(path)
+    _memory(journal, "first")
+    journal.close()
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write("garbage")
+
+    # Appending without a load() first must still start on a fresh line.
+    journal = StateJournal(path)
+    journal.seq = 1
+    _memory(journal, "second")
+    journal.close()
+
+    state, replayed = StateJournal(path).load(_default_state())
+    assert [m["text"] for m in state["short_term_memory"]] == ["first", "second"]
+
+
+def test_append_reports_when_compaction_is_due(tmp_path):
+    journal = StateJournal(str(tmp_path / "state.json"), compact_every=3)
+    assert not _memory(journal, "a")
+    assert not _memory(journal, "b")
+    assert _memory(journal, "c")
+    journal.compact({"short_term_memory": []})
+    assert journal.pending == 0
+    journal.close()